@@ -1,9 +1,75 @@
+import threading
+import time
 import flet as ft
 from pathlib import Path
 from core.company import Company, discover_companies
+from core.events import event_bus
+from core.runtime import run_company_tasks
 
 WORKSPACE_ROOT = Path(__file__).parent / "workspace"
 
+UI_FRAME_INTERVAL = 1 / 30 # Apply queued events at most once per frame
+MAX_CHAT_LINES = 500 # Older progress lines are dropped from the chat view
+TASK_ROW_HEIGHT = 56 # Fixed row height lets the task list virtualize
+
+
+class UIUpdateBatcher:
+    """
+    Collects core events from worker threads and hands them to the UI in
+    batches, at most once per frame.
+
+    Events for the same task are coalesced, so a task that changes status
+    many times between two frames is only redrawn once, with its latest state.
+    """
+    def __init__(self, apply_updates, interval: float = UI_FRAME_INTERVAL):
+        self._apply_updates = apply_updates
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._task_events: dict[str, dict] = {}
+        self._activity: list[dict] = []
+        self._wake = threading.Event()
+        self._stopped = False
+        self._unsubscribe = None
+        self._thread = threading.Thread(target=self._run, name="ui-updates", daemon=True)
+
+    def start(self):
+        self._unsubscribe = event_bus.subscribe(self.handle_event)
+        self._thread.start()
+
+    def stop(self):
+        if self._unsubscribe:
+            self._unsubscribe()
+        self._stopped = True
+        self._wake.set()
+
+    def handle_event(self, event: dict):
+        """Runs on the publishing thread, so it only queues the event."""
+        with self._lock:
+            if event["topic"].startswith("task."):
+                merged = self._task_events.setdefault(event["task_id"], {})
+                merged.update(event)
+            else:
+                self._activity.append(event)
+                del self._activity[:-MAX_CHAT_LINES]
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            if self._stopped:
+                return
+            self._wake.clear()
+            with self._lock:
+                task_events, self._task_events = self._task_events, {}
+                activity, self._activity = self._activity, []
+            if task_events or activity:
+                try:
+                    self._apply_updates(task_events, activity)
+                except Exception as e:
+                    print(f"WARNING: Failed to apply UI updates: {e}")
+            time.sleep(self._interval)
+
+
 def main(page: ft.Page):
     page.title = "CompanIA"
     page.window_width = 1200
@@ -28,6 +94,14 @@ def main(page: ft.Page):
     company_path = selected_manifest.pop('_company_path')
     active_company = Company(selected_manifest, company_path)
     active_company.load_agents()
+    # Tasks interrupted by a previous session continue where they stopped.
+    resumed_tasks = active_company.resume_tasks()
+
+    # --- UI State ---
+    state = {"agent": None}
+    task_status_texts: dict[str, ft.Text] = {}
+    # The batcher thread and Flet's event handlers both rebuild the chat.
+    chat_lock = threading.Lock()
 
     # --- UI Controls and Event Handlers ---
     chat_view = ft.ListView(
@@ -38,17 +112,120 @@ def main(page: ft.Page):
         padding=20,
     )
 
+    tasks_view = ft.ListView(
+        controls=[],
+        expand=True,
+        item_extent=TASK_ROW_HEIGHT,
+        auto_scroll=True,
+    )
+
+    task_input = ft.TextField(
+        hint_text="Describe a task for the selected agent...",
+        expand=True,
+        disabled=True,
+    )
+
+    def apply_updates(task_events: dict, activity: list):
+        """Applies one batch of events, updating only the lists that changed."""
+        for task_id, event in task_events.items():
+            status_text = task_status_texts.get(task_id)
+            if status_text is None:
+                task = active_company.tasks.get(task_id)
+                description = event.get("description") or (task.description if task else task_id)
+                status_text = ft.Text(event.get("status", "PENDING"), size=11)
+                task_status_texts[task_id] = status_text
+                tasks_view.controls.append(
+                    ft.ListTile(
+                        title=ft.Text(description, size=13, max_lines=1, overflow=ft.TextOverflow.ELLIPSIS),
+                        subtitle=ft.Text(f"{event.get('assignee_id', '')} - {task_id[:8]}", size=10),
+                        trailing=status_text,
+                        dense=True,
+                    )
+                )
+            elif "status" in event:
+                status_text.value = event["status"]
+        if task_events:
+            tasks_view.update()
+
+        if not activity:
+            return
+        with chat_lock:
+            selected_agent = state["agent"]
+            if selected_agent is None:
+                return
+            chat_changed = False
+            for event in activity:
+                task = active_company.tasks.get(event.get("task_id"))
+                if task is None or task.assignee_id != selected_agent.id:
+                    continue
+                if event["topic"] == "agent.phase":
+                    line = f"[{task.task_id[:8]}] Iteration {event['iteration']}: {event['phase']}"
+                else:
+                    line = f"[{task.task_id[:8]}]   {event['tool_name']} -> {event['status']}"
+                chat_view.controls.append(ft.Text(line, size=12, selectable=True))
+                chat_changed = True
+            if chat_changed:
+                del chat_view.controls[2:-MAX_CHAT_LINES] # Keep the header and divider
+                chat_view.update()
+
+    batcher = UIUpdateBatcher(apply_updates)
+    batcher.start()
+    # Resumed tasks were loaded before the batcher subscribed; list them too.
+    for task in resumed_tasks:
+        batcher.handle_event({
+            "topic": "task.status",
+            "task_id": task.task_id,
+            "description": task.description,
+            "assignee_id": task.assignee_id,
+            "status": task.status.value,
+        })
+    page.on_disconnect = lambda e: batcher.stop()
+
     def select_agent(e):
         """Called when an agent is clicked in the sidebar."""
         selected_agent = e.control.data
-        
-        # Clear the chat and add a header
-        chat_view.controls.clear()
-        chat_view.controls.append(
-             ft.Text(f"Conversation with {selected_agent.role}", size=20, weight=ft.FontWeight.BOLD, text_align=ft.TextAlign.CENTER)
-        )
-        chat_view.controls.append(ft.Divider())
-        page.update()
+        with chat_lock:
+            state["agent"] = selected_agent
+
+            # Clear the chat and add a header
+            chat_view.controls.clear()
+            chat_view.controls.append(
+                 ft.Text(f"Conversation with {selected_agent.role}", size=20, weight=ft.FontWeight.BOLD, text_align=ft.TextAlign.CENTER)
+            )
+            chat_view.controls.append(ft.Divider())
+            chat_view.update()
+        task_input.disabled = False
+        task_input.update()
+
+    # One long-lived runner works through every runnable task. Submitting a
+    # task sets the event; the runner clears it before each pass, so a task
+    # created while a pass is finishing is picked up by the next one.
+    work_available = threading.Event()
+
+    def run_tasks():
+        while True:
+            work_available.wait()
+            work_available.clear()
+            try:
+                run_company_tasks(active_company)
+            except Exception as e:
+                print(f"WARNING: Task runner failed: {e}")
+
+    threading.Thread(target=run_tasks, name="task-runner", daemon=True).start()
+    if resumed_tasks:
+        work_available.set()
+
+    def submit_task(e):
+        """Creates a task for the selected agent and wakes the task runner."""
+        description = task_input.value.strip()
+        if not description or state["agent"] is None:
+            return
+        active_company.create_task(description=description, assignee_id=state["agent"].id)
+        task_input.value = ""
+        task_input.update()
+        work_available.set()
+
+    task_input.on_submit = submit_task
 
     # --- Build the Sidebar ---
     agent_list_items = []
@@ -62,7 +239,7 @@ def main(page: ft.Page):
                 data=agent,
             )
         )
-    
+
     sidebar = ft.Column(
         controls=[
             ft.Text("Agents", size=18, weight=ft.FontWeight.BOLD),
@@ -72,6 +249,23 @@ def main(page: ft.Page):
         spacing=10,
     )
 
+    chat_panel = ft.Column(
+        controls=[
+            chat_view,
+            ft.Row(controls=[task_input, ft.IconButton(icon="send", on_click=submit_task)]),
+        ],
+        expand=True,
+    )
+
+    tasks_panel = ft.Column(
+        controls=[
+            ft.Text("Tasks", size=18, weight=ft.FontWeight.BOLD),
+            tasks_view,
+        ],
+        width=350,
+        spacing=10,
+    )
+
     # --- Build the Final Layout ---
     # Clear the progress ring and add the final UI
     page.controls.clear()
@@ -83,7 +277,9 @@ def main(page: ft.Page):
             controls=[
                 sidebar,
                 ft.VerticalDivider(width=1),
-                chat_view,
+                chat_panel,
+                ft.VerticalDivider(width=1),
+                tasks_panel,
             ],
             expand=True,
         )
@@ -92,4 +288,4 @@ def main(page: ft.Page):
 
 # --- Run the Application ---
 if __name__ == "__main__":
-    ft.app(target=main)
\ No newline at end of file
+    ft.app(target=main)
@@ -0,0 +1,74 @@
+"""
+Import-time benchmark for the core package.
+
+Imports each module in a fresh interpreter several times and fails (exit
+code 1) if the median import takes longer than the budget, or if importing it
+pulls in one of the heavy dependencies that must only load on first use.
+
+Usage:
+    python benchmarks/import_time.py [--budget 0.5] [--runs 5]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+MODULES = ["core.company", "core.runtime", "core.memory", "core.llm_api", "core.orchestrator"]
+
+# These take seconds to import and must stay behind lazy imports.
+HEAVY_MODULES = ["chromadb", "sentence_transformers", "torch", "google.generativeai", "numpy", "dotenv"]
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(elapsed, ",".join(heavy))
+"""
+
+
+def measure(module: str) -> tuple[float, list[str]]:
+    """Imports the module in a new interpreter, returning seconds taken and heavy modules loaded."""
+    elapsed, _, heavy = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip().splitlines()[-1].partition(" ")
+    return float(elapsed), [name for name in heavy.split(",") if name]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Guard against import-time regressions.")
+    parser.add_argument("--budget", type=float, default=0.5, help="Maximum median import time in seconds.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module.")
+    args = parser.parse_args()
+
+    failed = False
+    for module in MODULES:
+        timings = []
+        heavy = []
+        for _ in range(args.runs):
+            elapsed, heavy = measure(module)
+            timings.append(elapsed)
+        median = statistics.median(timings)
+
+        problems = []
+        if median > args.budget:
+            problems.append(f"over the {args.budget:.2f}s budget")
+        if heavy:
+            problems.append(f"eagerly imports {', '.join(heavy)}")
+        failed = failed or bool(problems)
+        status = "FAIL: " + "; ".join(problems) if problems else "ok"
+        print(f"{module:<22} {median * 1000:8.1f} ms  {status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,9 @@ from typing import TYPE_CHECKING
 from .vfs import FileSystemManager
 from .task import Task, TaskStatus
 from .llm_api import generate_structured_response
-from .orchestrator import execute_actions
+from .orchestrator import TOOL_REGISTRY, execute_actions, validate_actions
+from .json_repair import parse_llm_json
+from .events import event_bus
 
 if TYPE_CHECKING:
     from .company import Company
@@ -26,19 +28,11 @@ class Agent:
         print(f"    Role: {self.role}")
         
     def _get_tool_manifest(self) -> str:
-        tool_descriptions = {
-            "CREATE_FILE": "Creates a new, empty file. Payload requires 'path'.",
-            "WRITE_FILE": "Writes or appends content. Payload requires 'path' and 'content'. Optional: 'append': true.",
-            "READ_FILE": "Reads a file's content. Payload requires 'path'.",
-            "LIST_FILES": "Lists files in a directory. Optional payload: 'path'.",
-            "DELEGATE_TASK": "Delegates a task to another agent. Payload requires 'assignee_id', 'description'. Optional: 'block_self': true.",
-            "MEMORIZE_THIS": "Adds text to your long-term memory. Payload requires 'text', and an optional 'metadata' dictionary.",
-            "RECALL_CONTEXT": "Searches your long-term memory based on a query. Payload requires 'query'."
-        }
         available_tools = self.meta.get('capabilities', {}).get('allowed_tools', [])
         manifest = "Your available tools and their required parameters are:\n"
         for tool_name in available_tools:
-            description = tool_descriptions.get(tool_name, "No description available.")
+            tool_spec = TOOL_REGISTRY.get(tool_name)
+            description = tool_spec.description if tool_spec else "No description available."
             manifest += f"- {tool_name}: {description}\n"
         return manifest
 
@@ -171,76 +165,187 @@ class Agent:
         """
         return prompt
 
+    def _construct_repair_prompt(self, raw_response: str, errors: list[str], expected_format: str) -> str:
+        """Constructs a short prompt asking only to fix a malformed response."""
+        problems = "\n".join(f"- {error}" for error in errors)
+        prompt = f"""
+        Your previous response could not be used because of these problems:
+        {problems}
+
+        This was your previous response:
+        {raw_response}
+
+        Return the same content, corrected. Do not change your decisions, only fix the problems above.
+        Your response MUST be a valid JSON object with these fields (do NOT output any other text, just the JSON):
+        {expected_format}
+        """
+        return prompt
+
+    @staticmethod
+    def _validate_plan(plan: dict) -> list[str]:
+        return validate_actions(plan.get('actions', []))
+
+    @staticmethod
+    def _validate_reflection(reflection: dict) -> list[str]:
+        is_complete = reflection.get('is_complete')
+        # Models sometimes answer with a string; accept the unambiguous ones.
+        if isinstance(is_complete, str) and is_complete.strip().lower() in ("true", "false"):
+            reflection['is_complete'] = is_complete.strip().lower() == "true"
+        elif not isinstance(is_complete, bool):
+            return ["'is_complete' must be true or false."]
+        reflection.setdefault('critique', 'No critique provided.')
+        return []
+
+    def _parse_response(self, raw_response: str, validator, expected_format: str) -> tuple[dict | None, list[str]]:
+        """
+        Parses and validates a structured LLM response.
+
+        Malformed JSON is repaired locally first. Only if that fails, or the
+        result does not validate, is the model asked once (on the cheap repair
+        tier) to correct its response.
+
+        Returns:
+            The parsed response and an empty list, or None and the problems found.
+        """
+        def parse(raw: str) -> tuple[dict | None, list[str]]:
+            try:
+                parsed = parse_llm_json(raw)
+            except ValueError as e:
+                return None, [str(e)]
+            errors = validator(parsed)
+            return (None, errors) if errors else (parsed, [])
+
+        parsed, errors = parse(raw_response)
+        if parsed is not None:
+            return parsed, []
+
+        print(f"  -> Response could not be used ({'; '.join(errors)}). Asking for a corrected one...")
+        repair_prompt = self._construct_repair_prompt(raw_response, errors, expected_format)
+        raw_retry = generate_structured_response(repair_prompt, call_type="repair", agent_id=self.id, router=self.company.model_router)
+        if not raw_retry:
+            return None, errors
+        return parse(raw_retry)
+
+    def _publish_phase(self, task: Task, phase: str):
+        event_bus.publish("agent.phase", agent_id=self.id, task_id=task.task_id, phase=phase, iteration=task.iteration_count)
+
+    def _finish(self, task: Task, status: TaskStatus, notes: str):
+        task.set_status(status, notes)
+        self.company.finish_task(task)
+
+    def _restore_checkpoint(self, task: Task) -> dict | None:
+        """
+        Restores the task's progress from its checkpoint, if it has one.
+
+        Returns:
+            The outputs of the interrupted iteration ('plan' and possibly
+            'execution_results') when it stopped mid-iteration, else None.
+        """
+        checkpoint = self.company.checkpoints.load(task.task_id)
+        if checkpoint is None:
+            return None
+
+        saved = checkpoint["task"]
+        if saved.get("iteration_count", 0) > task.iteration_count:
+            task.iteration_count = saved["iteration_count"]
+            task.previous_attempts = saved.get("previous_attempts", [])
+
+        if checkpoint["phase"] in ("plan", "execute"):
+            print(f"Resuming iteration #{task.iteration_count} after its '{checkpoint['phase']}' phase.")
+            return {"plan": checkpoint.get("plan"), "execution_results": checkpoint.get("execution_results")}
+        return None
+
     def process_task(self, task: Task):
-        """Processes a task with a Plan -> Execute -> Reflect -> Iterate loop."""
+        """
+        Processes a task with a Plan -> Execute -> Reflect -> Iterate loop.
+
+        Every completed phase is checkpointed, so if the process dies mid-task
+        the next call resumes after the last completed phase instead of
+        paying for it again.
+        """
         print(f"\nAgent '{self.role}' is processing Task {task.task_id}...")
         
         max_iterations = 3
         is_complete = False
+        resume = self._restore_checkpoint(task)
 
-        while not is_complete and task.iteration_count < max_iterations:
-            task.iteration_count += 1
+        while not is_complete and (resume or task.iteration_count < max_iterations):
+            plan = execution_results = None
+            if resume:
+                plan, execution_results = resume["plan"], resume["execution_results"]
+                resume = None
+            else:
+                task.iteration_count += 1
             print(f"\n{'='*10} Starting Iteration #{task.iteration_count} {'='*10}")
 
             # === 1. PLAN PHASE ===
-            print("\n--- Phase 1: Planning ---")
-            task.set_status(TaskStatus.IN_PROGRESS, f"Agent is planning iteration {task.iteration_count}.")
-            if task.iteration_count == 1:
-                plan_prompt = self._construct_initial_prompt(task)
+            if plan is None:
+                print("\n--- Phase 1: Planning ---")
+                self._publish_phase(task, "plan")
+                task.set_status(TaskStatus.IN_PROGRESS, f"Agent is planning iteration {task.iteration_count}.")
+                if task.iteration_count == 1:
+                    plan_prompt = self._construct_initial_prompt(task)
+                else:
+                    plan_prompt = self._construct_iteration_prompt(task, task.previous_attempts)
+                
+                raw_plan_response = generate_structured_response(plan_prompt, call_type="plan", agent_id=self.id, router=self.company.model_router)
+                if not raw_plan_response:
+                    self._finish(task, TaskStatus.FAILED, "Agent failed to generate a plan.")
+                    return
+
+                plan, errors = self._parse_response(raw_plan_response, self._validate_plan, '{"reasoning": "...", "actions": [{"tool_name": "TOOL_NAME", "payload": {}}]}')
+                if plan is None:
+                    self._finish(task, TaskStatus.FAILED, f"Agent returned an invalid plan ({'; '.join(errors)}). Raw response: {raw_plan_response}")
+                    return
+                self.company.checkpoints.save(task, "plan", plan=plan)
             else:
-                plan_prompt = self._construct_iteration_prompt(task, task.previous_attempts)
-            
-            raw_plan_response = generate_structured_response(plan_prompt)
-            if not raw_plan_response:
-                task.set_status(TaskStatus.FAILED, "Agent failed to generate a plan.")
-                return
-
-            try:
-                plan = json.loads(raw_plan_response.strip().replace("```json", "").replace("```", ""))
-                print(f"Agent's Plan Reasoning: {plan.get('reasoning')}")
-            except json.JSONDecodeError:
-                task.set_status(TaskStatus.FAILED, f"Agent returned invalid JSON for its plan. Raw response: {raw_plan_response}")
-                return
+                task.set_status(TaskStatus.IN_PROGRESS, f"Agent resumed iteration {task.iteration_count} from a checkpoint.")
+            print(f"Agent's Plan Reasoning: {plan.get('reasoning')}")
             
             # === 2. EXECUTE PHASE ===
-            print("\n--- Phase 2: Execution ---")
-            actions = plan.get('actions', [])
-            execution_results = execute_actions(actions, self.company, task) if actions else []
-
-            # If the task was blocked by a tool (like DELEGATE_TASK), the agent's turn is over.
-            if task.status == TaskStatus.BLOCKED:
-                print(f"Agent '{self.role}' task is now BLOCKED, ending turn.")
-                return # Exit the process_task method immediately
+            if execution_results is None:
+                print("\n--- Phase 2: Execution ---")
+                self._publish_phase(task, "execute")
+                actions = plan.get('actions', [])
+                execution_results = execute_actions(actions, self.company, task) if actions else []
+
+                # If the task was blocked by a tool (like DELEGATE_TASK), the agent's turn is over.
+                if task.status == TaskStatus.BLOCKED:
+                    self.company.checkpoints.save(task, "blocked")
+                    print(f"Agent '{self.role}' task is now BLOCKED, ending turn.")
+                    return # Exit the process_task method immediately
+                self.company.checkpoints.save(task, "execute", plan=plan, execution_results=execution_results)
 
             # === 3. REFLECT PHASE ===
             print("\n--- Phase 3: Reflection ---")
+            self._publish_phase(task, "reflect")
             reflection_prompt = self._construct_reflection_prompt(task, plan, execution_results)
-            raw_reflection_response = generate_structured_response(reflection_prompt)
+            raw_reflection_response = generate_structured_response(reflection_prompt, call_type="reflect", agent_id=self.id, router=self.company.model_router)
             if not raw_reflection_response:
-                task.set_status(TaskStatus.FAILED, "Agent failed to generate a reflection.")
+                self._finish(task, TaskStatus.FAILED, "Agent failed to generate a reflection.")
                 return
             
-            try:
-                reflection = json.loads(raw_reflection_response.strip().replace("```json", "").replace("```", ""))
-                critique = reflection.get('critique', 'No critique provided.')
-                is_complete = reflection.get('is_complete', False)
-                print(f"Agent's Self-Critique: {critique}")
-                
-                if is_complete:
-                    print("\nAgent has concluded the task is complete.")
-                    task.set_status(TaskStatus.COMPLETED, f"Agent self-assessed as complete after {task.iteration_count} iteration(s).")
-                else:
-                    print("\nAgent has concluded the task is INCOMPLETE. Preparing for next iteration.")
-                    task.previous_attempts.append({
-                        "plan": plan,
-                        "execution_results": execution_results,
-                        "critique": reflection
-                    })
-
-            except json.JSONDecodeError:
-                task.set_status(TaskStatus.FAILED, f"Agent returned invalid JSON for its reflection. Raw response: {raw_reflection_response}")
+            reflection, errors = self._parse_response(raw_reflection_response, self._validate_reflection, '{"critique": "...", "is_complete": true}')
+            if reflection is None:
+                self._finish(task, TaskStatus.FAILED, f"Agent returned an invalid reflection ({'; '.join(errors)}). Raw response: {raw_reflection_response}")
                 return
 
+            critique = reflection.get('critique', 'No critique provided.')
+            is_complete = reflection['is_complete']
+            print(f"Agent's Self-Critique: {critique}")
+
+            if is_complete:
+                print("\nAgent has concluded the task is complete.")
+                self._finish(task, TaskStatus.COMPLETED, f"Agent self-assessed as complete after {task.iteration_count} iteration(s).")
+            else:
+                print("\nAgent has concluded the task is INCOMPLETE. Preparing for next iteration.")
+                task.previous_attempts.append({
+                    "plan": plan,
+                    "execution_results": execution_results,
+                    "critique": reflection
+                })
+                self.company.checkpoints.save(task, "reflect")
+
         if not is_complete:
             print(f"\nAgent failed to complete the task after {max_iterations} iterations.")
-            task.set_status(TaskStatus.FAILED, f"Agent failed to complete task after {max_iterations} iterations.")
\ No newline at end of file
+            self._finish(task, TaskStatus.FAILED, f"Agent failed to complete task after {max_iterations} iterations.")
\ No newline at end of file
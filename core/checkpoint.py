@@ -0,0 +1,67 @@
+# core/checkpoint.py
+
+import json
+import os
+from pathlib import Path
+
+
+class CheckpointStore:
+    """
+    Persists per-task progress so a restarted worker can resume mid-task.
+
+    Each task has one small JSON file, rewritten atomically after every
+    completed phase of its Plan -> Execute -> Reflect loop:
+
+        created   the task exists but has not started
+        plan      the plan of the current iteration is known
+        execute   the plan was executed; reflection is still pending
+        reflect   the iteration is over and the task continues
+        blocked   the task is waiting on delegated sub-tasks
+        completed / failed  the task is finished
+
+    Finished sub-tasks keep their checkpoint until their root task finishes,
+    so a resumed parent can still see that its dependencies completed.
+    """
+    def __init__(self, checkpoint_dir: Path):
+        self.dir = checkpoint_dir
+
+    def _path(self, task_id: str) -> Path:
+        return self.dir / f"{task_id}.json"
+
+    def save(self, task, phase: str, **state):
+        """
+        Writes the task's state after a completed phase.
+
+        Args:
+            task: The Task being checkpointed.
+            phase: The phase that just completed (see the class docstring).
+            **state: Phase outputs needed to resume, e.g. plan or execution_results.
+        """
+        self.dir.mkdir(parents=True, exist_ok=True)
+        checkpoint = {"phase": phase, "task": task.to_dict(), **state}
+        tmp_path = self._path(task.task_id).with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, separators=(',', ':'), default=str)
+        os.replace(tmp_path, self._path(task.task_id))
+
+    def load(self, task_id: str) -> dict | None:
+        path = self._path(task_id)
+        if not path.is_file():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            print(f"  -> WARNING: Ignoring unreadable checkpoint '{path.name}'.")
+            return None
+
+    def load_all(self) -> list[dict]:
+        if not self.dir.is_dir():
+            return []
+        checkpoints = [self.load(path.stem) for path in sorted(self.dir.glob("*.json"))]
+        return [checkpoint for checkpoint in checkpoints if checkpoint]
+
+    def delete(self, task_id: str):
+        path = self._path(task_id)
+        if path.exists():
+            path.unlink()
@@ -1,24 +1,49 @@
 # core/company.py
 
 import json
+import re
 from pathlib import Path
 from .vfs import FileSystemManager
 from .agent import Agent
-from .task import Task
+from .task import Task, TaskStatus
 from .memory import MemoryManager
+from .llm_api import ModelRouter
+from .events import event_bus
+from .checkpoint import CheckpointStore
+
+DEFAULT_MAX_TASK_DEPTH = 10
+DEFAULT_MAX_SUBTASKS_PER_TASK = 10
+
+def _normalize_description(description: str) -> str:
+    """Case, whitespace and trailing punctuation do not make two tasks different."""
+    return re.sub(r"\s+", " ", description).strip().rstrip(".!").lower()
 
 class Company:
     """
     Represents a single, loaded company instance.
     """
-    def __init__(self, manifest_data: dict, company_path: Path):
+    def __init__(self, manifest_data: dict, company_path: Path, embedding_model=None):
         self.manifest = manifest_data
         self.path = company_path
         self.name = manifest_data.get('identity', {}).get('name', 'Unnamed Company')
         self.fs = FileSystemManager(company_root=self.path)
-        self.memory = MemoryManager(company_root=self.path) # <-- ADD THIS LINE
+        self.memory = MemoryManager(
+            company_root=self.path,
+            embedding_model=embedding_model,
+            memory_policy=manifest_data.get('memory_policy'),
+            memory_storage=manifest_data.get('memory_storage'),
+        )
+        self.model_router = ModelRouter.from_manifest(manifest_data)
+        self.checkpoints = CheckpointStore(self.path / "checkpoints")
         self.agents = {}
         self.tasks = {} # A dictionary to hold active tasks
+        # (assignee_id, normalized description, parent task_id) -> task_id,
+        # so a repeated delegation finds the sub-task it already created.
+        self._delegation_index: dict[tuple, str] = {}
+
+        governance = manifest_data.get('governance', {})
+        self.max_task_depth = governance.get('max_task_depth', DEFAULT_MAX_TASK_DEPTH)
+        self.max_subtasks_per_task = governance.get('max_subtasks_per_task', DEFAULT_MAX_SUBTASKS_PER_TASK)
 
     def __repr__(self) -> str:
         return f"<Company name='{self.name}'>"
@@ -29,16 +54,111 @@ class Company:
         print(f"Vision: {self.manifest.get('identity', {}).get('vision', 'N/A')}")
         print(f"Path: {self.path}")
 
-    def create_task(self, description: str, assignee_id: str) -> Task:
-        """Creates a new task and adds it to the company's task registry."""
+    def create_task(self, description: str, assignee_id: str, delegator_id: str = "OWNER", parent_task: Task = None) -> Task:
+        """
+        Creates a new task and adds it to the company's task registry.
+
+        Sub-tasks (those with a parent_task) are subject to the governance
+        limits on delegation depth and on the number of sub-tasks per task.
+
+        Raises:
+            ValueError: If the assignee does not exist or a limit is exceeded.
+        """
         if assignee_id not in self.agents:
             raise ValueError(f"Cannot assign task: Agent ID '{assignee_id}' not found.")
-        
-        new_task = Task(description=description, assignee_id=assignee_id)
-        self.tasks[new_task.task_id] = new_task
+
+        depth = 0
+        if parent_task is not None:
+            depth = parent_task.depth + 1
+            if depth > self.max_task_depth:
+                raise ValueError(f"Cannot delegate: the maximum task depth of {self.max_task_depth} has been reached.")
+            if len(parent_task.subtask_ids) >= self.max_subtasks_per_task:
+                raise ValueError(f"Cannot delegate: task {parent_task.task_id[:8]} already has the maximum of {self.max_subtasks_per_task} sub-tasks.")
+
+        new_task = Task(
+            description=description,
+            assignee_id=assignee_id,
+            delegator_id=delegator_id,
+            parent_id=parent_task.task_id if parent_task else None,
+            depth=depth,
+        )
+        if parent_task is not None:
+            parent_task.subtask_ids.append(new_task.task_id)
+        self._register_task(new_task)
+        # Checkpoint right away: a sub-task that has not started yet must
+        # survive a restart, or its blocked parent could never resume.
+        self.checkpoints.save(new_task, "created")
         print(f"New task created and assigned to {assignee_id}: {new_task.task_id}")
+        event_bus.publish(
+            "task.created",
+            task_id=new_task.task_id,
+            description=description,
+            assignee_id=assignee_id,
+            parent_id=new_task.parent_id,
+        )
         return new_task
 
+    def _register_task(self, task: Task):
+        self.tasks[task.task_id] = task
+        self._delegation_index[(task.assignee_id, _normalize_description(task.description), task.parent_id)] = task.task_id
+
+    def resume_tasks(self) -> list[Task]:
+        """
+        Reloads the tasks of an interrupted run from their checkpoints.
+
+        Tasks that were in progress are set back to PENDING; when an agent
+        processes one again, it continues after its last completed phase.
+
+        Returns:
+            The tasks that still need work.
+        """
+        resumed = []
+        for checkpoint in self.checkpoints.load_all():
+            task = Task.from_dict(checkpoint["task"])
+            if task.assignee_id not in self.agents:
+                print(f"  -> WARNING: Skipping checkpoint of task {task.task_id}: agent '{task.assignee_id}' not found.")
+                continue
+            self._register_task(task)
+            if task.status == TaskStatus.IN_PROGRESS:
+                task.set_status(TaskStatus.PENDING, f"Resumed from checkpoint after phase '{checkpoint['phase']}'.")
+            if task.status not in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+                resumed.append(task)
+        if resumed:
+            print(f"Resumed {len(resumed)} unfinished task(s) from checkpoints.")
+        return resumed
+
+    def finish_task(self, task: Task):
+        """
+        Records that a task reached COMPLETED or FAILED.
+
+        A finished sub-task keeps a final checkpoint, since its parent may
+        still be waiting on it. When a root task finishes, the checkpoints of
+        its whole delegation tree are removed.
+        """
+        if task.parent_id is not None:
+            self.checkpoints.save(task, task.status.value.lower())
+            return
+
+        pending = [task.task_id]
+        while pending:
+            task_id = pending.pop()
+            self.checkpoints.delete(task_id)
+            subtask = self.tasks.get(task_id)
+            if subtask is not None:
+                pending.extend(subtask.subtask_ids)
+
+    def find_equivalent_task(self, description: str, assignee_id: str, parent_id: str | None) -> Task | None:
+        """
+        Returns an open or completed task with the same assignee, description
+        and parent, if there is one. Failed tasks are not reused, so a failed
+        delegation can be retried.
+        """
+        task_id = self._delegation_index.get((assignee_id, _normalize_description(description), parent_id))
+        task = self.tasks.get(task_id)
+        if task is None or task.status == TaskStatus.FAILED:
+            return None
+        return task
+
     def load_agents(self):
         """
         Scans the company's VFS for agent directories and loads them.
@@ -0,0 +1,58 @@
+# core/events.py
+
+import threading
+import time
+
+
+class EventBus:
+    """
+    A minimal in-process publish/subscribe bus for progress events.
+
+    Topics published by the core:
+        task.created  task_id, description, assignee_id, parent_id
+        task.status   task_id, status, notes, assignee_id
+        agent.phase   agent_id, task_id, phase, iteration
+        tool.finished task_id, tool_name, status
+
+    Handlers run synchronously on the publishing (worker) thread, so they
+    should only hand the event off, e.g. to a queue, and return.
+    """
+    def __init__(self):
+        self._subscribers: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, handler, topics: list[str] = None):
+        """
+        Registers handler(event) for the given topics, or for every topic.
+
+        Returns:
+            A function that removes the subscription.
+        """
+        keys = topics or ["*"]
+        with self._lock:
+            for key in keys:
+                self._subscribers.setdefault(key, []).append(handler)
+
+        def unsubscribe():
+            with self._lock:
+                for key in keys:
+                    if handler in self._subscribers.get(key, []):
+                        self._subscribers[key].remove(handler)
+        return unsubscribe
+
+    def publish(self, topic: str, **data):
+        with self._lock:
+            handlers = self._subscribers.get(topic, []) + self._subscribers.get("*", [])
+        if not handlers:
+            return
+        event = {"topic": topic, "timestamp": time.time(), **data}
+        for handler in handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                # A broken subscriber must never fail the task that published.
+                print(f"  -> WARNING: Event handler failed for '{topic}': {e}")
+
+
+# The process-wide bus used by tasks, agents and the orchestrator.
+event_bus = EventBus()
@@ -0,0 +1,157 @@
+# core/json_repair.py
+
+import json
+import re
+
+_FENCE_RE = re.compile(r"```(?:json)?", re.IGNORECASE)
+# Typographic double quotes are only treated as string delimiters where a
+# string may start; inside a string they are ordinary characters.
+_SMART_QUOTES = "“”"
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def extract_json_object(text: str) -> str | None:
+    """
+    Returns the first complete top-level JSON object in the text, skipping any
+    prose or markdown around it. If the object is never closed (e.g. the
+    response was cut off), everything from its opening brace is returned.
+    """
+    start = text.find("{")
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    closers = '"'
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char in closers:
+                in_string = False
+        elif char == '"' or char in _SMART_QUOTES:
+            in_string = True
+            closers = '"' if char == '"' else _SMART_QUOTES
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def repair_json(text: str) -> str:
+    """
+    Fixes the mistakes LLMs most often make when writing JSON:
+    trailing commas, raw newlines and tabs inside strings, Python literals
+    (True/False/None), typographic quotes used as string delimiters, and
+    missing closing brackets. Typographic quotes inside a string are content
+    and are kept as they are.
+    """
+    out: list[str] = []
+    stack: list[str] = []
+    in_string = False
+    smart_delimited = False # The current string was opened by a typographic quote
+    escaped = False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+                out.append(char)
+            elif char == "\\":
+                escaped = True
+                out.append(char)
+            elif char == '"' and not smart_delimited:
+                in_string = False
+                out.append(char)
+            elif char in _SMART_QUOTES and smart_delimited:
+                in_string = False
+                out.append('"')
+            elif char == '"':
+                out.append('\\"') # A plain quote inside a typographically quoted string
+            elif char == "\n":
+                out.append("\\n")
+            elif char == "\r":
+                out.append("\\r")
+            elif char == "\t":
+                out.append("\\t")
+            else:
+                out.append(char)
+        elif char == '"' or char in _SMART_QUOTES:
+            in_string = True
+            smart_delimited = char != '"'
+            out.append('"')
+        elif char in "{[":
+            stack.append(char)
+            out.append(char)
+        elif char in "}]":
+            _strip_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(char)
+        elif char.isalpha():
+            word_end = i
+            while word_end < len(text) and text[word_end].isalpha():
+                word_end += 1
+            word = text[i:word_end]
+            out.append(_PYTHON_LITERALS.get(word, word))
+            i = word_end
+            continue
+        else:
+            out.append(char)
+        i += 1
+
+    # A response cut off mid-string lost content; leave it broken so the
+    # caller asks again rather than acting on a truncated value.
+    if in_string:
+        return "".join(out)
+    # Otherwise close any brackets the model forgot at the end.
+    _strip_trailing_comma(out)
+    while stack:
+        out.append(_CLOSERS[stack.pop()])
+    return "".join(out)
+
+
+def _strip_trailing_comma(out: list[str]):
+    """Drops a comma (and the whitespace after it) from the end of the output."""
+    j = len(out) - 1
+    while j >= 0 and out[j].isspace():
+        j -= 1
+    if j >= 0 and out[j] == ",":
+        del out[j]
+
+
+def parse_llm_json(raw: str) -> dict:
+    """
+    Parses a JSON object from an LLM response, repairing it locally if needed.
+
+    Raises:
+        ValueError: If no JSON object can be recovered from the response.
+    """
+    cleaned = _FENCE_RE.sub("", raw).strip()
+    try:
+        parsed = json.loads(cleaned)
+    except json.JSONDecodeError:
+        candidate = extract_json_object(cleaned)
+        if candidate is None:
+            raise ValueError("The response does not contain a JSON object.")
+        try:
+            parsed = json.loads(candidate)
+        except json.JSONDecodeError:
+            try:
+                parsed = json.loads(repair_json(candidate))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"The response is not valid JSON and could not be repaired: {e}") from e
+            print("  -> Repaired malformed JSON in the response locally.")
+
+    if not isinstance(parsed, dict):
+        raise ValueError("The response must be a JSON object.")
+    return parsed
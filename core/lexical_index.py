@@ -0,0 +1,196 @@
+# core/lexical_index.py
+
+import json
+import math
+import os
+import re
+from pathlib import Path
+
+# Words, plus compound identifiers such as "agent_id_dba_001", "docs/api_spec.md"
+# or "tech-spec.v2", which are kept whole as well as split into their parts.
+_TOKEN_RE = re.compile(r"\w+(?:[./-]\w+)*")
+_PART_SPLIT_RE = re.compile(r"[_./-]+")
+_IDENTIFIER_RE = re.compile(r"^(?=.*[_./\-\d])\w+(?:[./-]\w+)*$")
+# The log is folded into the snapshot once it holds more entries than both
+# this and the number of indexed documents.
+_MIN_LOG_ENTRIES = 1000
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercases and tokenizes text, indexing compound identifiers whole and by part."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = [part for part in _PART_SPLIT_RE.split(token) if part]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def is_identifier_query(query: str) -> bool:
+    """True for single-token queries such as task ids, agent ids, file or table names."""
+    return bool(_IDENTIFIER_RE.match(query.strip()))
+
+
+class LexicalIndex:
+    """
+    A small BM25 inverted index over memorized documents.
+
+    It complements the vector store: exact identifiers rank well here, and a
+    lookup needs no embedding forward pass.
+
+    The index is persisted as a JSON snapshot plus an append-only log of the
+    additions and removals made since, so an insert costs one small append
+    however large the index is. The log is folded into a new snapshot by
+    `compact()`, which runs on its own once the log outgrows the index.
+    """
+    def __init__(self, index_path: Path, k1: float = 1.5, b: float = 0.75):
+        self.path = index_path
+        self.log_path = index_path.with_suffix('.log')
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, dict[str, int]] = {}
+        self.doc_lengths: dict[str, int] = {}
+        self.total_length = 0
+        self._log_entries = 0
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def _load(self):
+        try:
+            if self.path.is_file():
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.postings = data.get('postings', {})
+                self.doc_lengths = data.get('doc_lengths', {})
+                self.total_length = sum(self.doc_lengths.values())
+            if self.log_path.is_file():
+                with open(self.log_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if not line.endswith("\n"):
+                            break # Append cut short by a crash
+                        self._apply(json.loads(line))
+                        self._log_entries += 1
+        except (json.JSONDecodeError, OSError):
+            print(f"  -> WARNING: Could not read lexical index at '{self.path}', it will be rebuilt.")
+            self.postings, self.doc_lengths, self.total_length = {}, {}, 0
+
+    def _apply(self, entry: dict):
+        if entry["op"] == "add":
+            self._add(entry["id"], entry["text"])
+        elif entry["op"] == "remove":
+            self._remove(set(entry["ids"]))
+
+    def _append_log(self, entry: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, separators=(',', ':')) + "\n")
+        self._log_entries += 1
+        # Keep startup replay proportional to the index size.
+        if self._log_entries > max(_MIN_LOG_ENTRIES, len(self.doc_lengths)):
+            self.compact()
+
+    def compact(self):
+        """
+        Writes a new snapshot and clears the log.
+
+        The snapshot is written atomically before the log is removed, and
+        replaying a log over a snapshot that already contains it is harmless.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'postings': self.postings, 'doc_lengths': self.doc_lengths}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+        if self.log_path.exists():
+            self.log_path.unlink()
+        self._log_entries = 0
+
+    def _add(self, doc_id: str, text: str):
+        tokens = tokenize(text)
+        if doc_id in self.doc_lengths:
+            self._remove_reindexed(doc_id, tokens)
+        for token in tokens:
+            doc_counts = self.postings.setdefault(token, {})
+            doc_counts[doc_id] = doc_counts.get(doc_id, 0) + 1
+        self.doc_lengths[doc_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def _remove_reindexed(self, doc_id: str, tokens: list[str]):
+        """
+        Removes a document that is being indexed again.
+
+        Ids are content hashes, so the old text almost always has the same
+        tokens as the new one, and only their postings need visiting. The
+        full vocabulary scan remains as a fallback for when it does not.
+        """
+        removed = 0
+        for token in set(tokens):
+            doc_counts = self.postings.get(token)
+            if doc_counts and doc_id in doc_counts:
+                removed += doc_counts.pop(doc_id)
+                if not doc_counts:
+                    del self.postings[token]
+        if removed == self.doc_lengths[doc_id]:
+            self.total_length -= self.doc_lengths.pop(doc_id)
+        else:
+            self._remove({doc_id})
+
+    def _remove(self, doc_ids: set[str]):
+        doc_ids = {doc_id for doc_id in doc_ids if doc_id in self.doc_lengths}
+        if not doc_ids:
+            return
+        for doc_id in doc_ids:
+            self.total_length -= self.doc_lengths.pop(doc_id)
+        # One pass over the vocabulary, however many documents are removed.
+        for token in list(self.postings):
+            doc_counts = self.postings[token]
+            for doc_id in doc_ids.intersection(doc_counts):
+                del doc_counts[doc_id]
+            if not doc_counts:
+                del self.postings[token]
+
+    def add(self, doc_id: str, text: str):
+        self._add(doc_id, text)
+        self._append_log({"op": "add", "id": doc_id, "text": text})
+
+    def remove(self, doc_ids: list[str]):
+        self._remove(set(doc_ids))
+        self._append_log({"op": "remove", "ids": list(doc_ids)})
+
+    def rebuild(self, ids: list[str], documents: list[str]):
+        """Replaces the whole index with the given documents."""
+        self.postings, self.doc_lengths, self.total_length = {}, {}, 0
+        for doc_id, document in zip(ids, documents):
+            self._add(doc_id, document or "")
+        self.compact()
+
+    def has_token(self, token: str) -> bool:
+        """True if some indexed document contains the token, e.g. a whole identifier."""
+        return token.lower() in self.postings
+
+    def search(self, query: str, n_results: int = 5) -> list[tuple[str, float]]:
+        """
+        Ranks documents against the query with BM25.
+
+        Returns:
+            Up to n_results (doc_id, score) pairs, best first.
+        """
+        doc_count = len(self.doc_lengths)
+        if not doc_count:
+            return []
+        avg_length = self.total_length / doc_count or 1.0
+
+        scores: dict[str, float] = {}
+        for token in set(tokenize(query)):
+            doc_counts = self.postings.get(token)
+            if not doc_counts:
+                continue
+            idf = math.log(1 + (doc_count - len(doc_counts) + 0.5) / (len(doc_counts) + 0.5))
+            for doc_id, tf in doc_counts.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
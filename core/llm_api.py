@@ -1,24 +1,141 @@
 import os
 import time
 import json
-import google.generativeai as genai
-from dotenv import load_dotenv
+from .trace import get_tracer
 
 # --- Configuration ---
-load_dotenv()
-MOCK_MODE = os.getenv("MOCK_MODE", "False").lower() in ('true', '1', 't')
+# Nothing is configured at import time: the .env file is read on the first
+# call that needs it, and the Gemini SDK is only imported (and the API key
+# only required) when a real request is about to be made.
+_env_loaded = False
+_genai = None
 
-print(f"--- MOCK MODE status: {MOCK_MODE} ---")
+def _load_env():
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+        mock_mode = is_mock_mode()
+        print(f"--- MOCK MODE status: {mock_mode} ---")
+        if mock_mode:
+            print("--- Mock mode is active. Real API will not be used. ---")
 
-if not MOCK_MODE:
-    print("--- Configuring REAL Gemini API client ---")
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY not found. Please set it in your .env file.")
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-1.5-flash')
-else:
-    print("--- Mock mode is active. Real API will not be used. ---")
+def is_mock_mode() -> bool:
+    _load_env()
+    return os.getenv("MOCK_MODE", "False").lower() in ('true', '1', 't')
+
+def _get_genai():
+    """Imports and configures the Gemini SDK on first use."""
+    global _genai
+    if _genai is None:
+        _load_env()
+        print("--- Configuring REAL Gemini API client ---")
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found. Please set it in your .env file.")
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        _genai = genai
+    return _genai
+
+
+# --- Model Routing ---
+# Model behind each tier. A company can override these through the
+# "model_routing.tiers" section of its manifest.json.
+MODEL_TIERS = {
+    "fast": "gemini-1.5-flash-8b",
+    "balanced": "gemini-1.5-flash",
+    "strong": "gemini-1.5-pro",
+}
+TIER_ORDER = ["fast", "balanced", "strong"]
+
+# Tier used for each call type, keyed by the manifest's "operational_mode".
+OPERATIONAL_MODES = {
+    "ECONOMY": {"plan": "balanced", "reflect": "fast", "repair": "fast", "default": "fast"},
+    "BALANCED": {"plan": "strong", "reflect": "fast", "repair": "fast", "default": "balanced"},
+    "QUALITY": {"plan": "strong", "reflect": "balanced", "repair": "balanced", "default": "strong"},
+}
+
+# Prompts longer than this (in characters) are routed one tier up, since long
+# histories and results are where the cheaper models start to slip.
+DEFAULT_ESCALATE_ABOVE_CHARS = 60000
+
+
+class ModelRouter:
+    """
+    Chooses the model for each LLM call from its type, the calling agent and
+    the prompt size, and lists the fallbacks to try when a model is overloaded.
+
+    Manifest example:
+        "operational_mode": "BALANCED",
+        "model_routing": {
+            "tiers": {"strong": "gemini-1.5-pro"},
+            "call_types": {"reflect": "fast"},
+            "agents": {"agent_id_cto_001": {"reflect": "balanced"}},
+            "escalate_above_chars": 60000
+        }
+
+    Agents listed in governance.critical_decision_makers always plan with the
+    strong tier.
+    """
+    def __init__(self, operational_mode: str = "BALANCED", routing: dict = None, critical_agents: list[str] = None):
+        routing = routing or {}
+        mode = OPERATIONAL_MODES.get(str(operational_mode).upper())
+        if mode is None:
+            print(f"  -> WARNING: Unknown operational mode '{operational_mode}', using BALANCED routing.")
+            mode = OPERATIONAL_MODES["BALANCED"]
+        self.tiers = {**MODEL_TIERS, **routing.get("tiers", {})}
+        self.call_types = {**mode, **routing.get("call_types", {})}
+        self.agent_overrides = routing.get("agents", {})
+        self.critical_agents = set(critical_agents or [])
+        self.escalate_above_chars = routing.get("escalate_above_chars", DEFAULT_ESCALATE_ABOVE_CHARS)
+
+    @classmethod
+    def from_manifest(cls, manifest: dict) -> "ModelRouter":
+        return cls(
+            operational_mode=manifest.get("operational_mode", "BALANCED"),
+            routing=manifest.get("model_routing"),
+            critical_agents=manifest.get("governance", {}).get("critical_decision_makers"),
+        )
+
+    def select_tier(self, call_type: str, agent_id: str = None, prompt_chars: int = 0) -> str:
+        tier = self.call_types.get(call_type, self.call_types["default"])
+        if call_type == "plan" and agent_id in self.critical_agents:
+            tier = "strong"
+        tier = self.agent_overrides.get(agent_id, {}).get(call_type, tier)
+
+        if prompt_chars > self.escalate_above_chars and tier in TIER_ORDER:
+            tier = TIER_ORDER[min(TIER_ORDER.index(tier) + 1, len(TIER_ORDER) - 1)]
+        return tier
+
+    def candidate_models(self, call_type: str, agent_id: str = None, prompt_chars: int = 0) -> list[str]:
+        """The selected model first, then the other tiers, nearest first, cheaper before pricier."""
+        tier = self.select_tier(call_type, agent_id, prompt_chars)
+        position = TIER_ORDER.index(tier) if tier in TIER_ORDER else 1
+        fallback_tiers = sorted(
+            (t for t in TIER_ORDER if t != tier),
+            key=lambda t: (abs(TIER_ORDER.index(t) - position), TIER_ORDER.index(t)),
+        )
+        candidates = []
+        for name in [self.tiers.get(tier, tier)] + [self.tiers[t] for t in fallback_tiers]:
+            if name not in candidates:
+                candidates.append(name)
+        return candidates
+
+
+DEFAULT_ROUTER = ModelRouter()
+_models: dict = {}
+
+def _get_model(model_name: str):
+    """Returns a cached client for the given model."""
+    if model_name not in _models:
+        _models[model_name] = _get_genai().GenerativeModel(model_name)
+    return _models[model_name]
+
+def _is_overloaded(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(marker in message for marker in ("429", "503", "overloaded", "resource exhausted", "unavailable"))
 
 
 # --- Mock Responses ---
@@ -128,28 +245,52 @@ def _get_mock_response(prompt: str) -> str:
     return json.dumps(MOCK_RESPONSES["reflection_complete"])
 
 # --- Main API Function ---
-def generate_structured_response(prompt: str) -> str | None:
+def generate_structured_response(prompt: str, call_type: str = "default", agent_id: str = None, router: ModelRouter = None) -> str | None:
     """
-    Main function to get a response. Switches between real and mock mode.
+    Main function to get a response. Switches between real and mock mode,
+    and records or replays the call when a trace is active (see core.trace).
+
+    Args:
+        prompt: The full prompt to send.
+        call_type: What the call is for ("plan", "reflect", "repair", ...),
+                   used to pick the model tier.
+        agent_id: The calling agent, for per-agent routing overrides.
+        router: The company's ModelRouter. Defaults to BALANCED routing.
     """
-    if MOCK_MODE:
+    tracer = get_tracer()
+    if tracer and tracer.replaying:
+        return tracer.replay_llm(call_type, agent_id, prompt)
+
+    response = _generate(prompt, call_type, agent_id, router or DEFAULT_ROUTER)
+    if tracer:
+        tracer.record_llm(call_type, agent_id, prompt, response)
+    return response
+
+def _generate(prompt: str, call_type: str, agent_id: str | None, router: ModelRouter) -> str | None:
+    candidates = router.candidate_models(call_type, agent_id, len(prompt))
+
+    if is_mock_mode():
+        print(f"  -> MOCK MODE: '{call_type}' call would be routed to {candidates[0]}.")
         return _get_mock_response(prompt)
 
-    # --- Real API Call with Retry Logic ---
+    # --- Real API Call with Fallback and Retry Logic ---
+    _get_genai() # Fails loudly on a missing API key, before any retries
     max_retries = 3
     for attempt in range(max_retries):
-        try:
-            response = model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            if "429" in str(e):
-                wait_time = 5 * (attempt + 1)
-                print(f"  -> WARNING: Rate limit exceeded. Waiting for {wait_time}s... (Attempt {attempt + 1}/{max_retries})")
-                time.sleep(wait_time)
-                continue
-            else:
+        for model_name in candidates:
+            try:
+                response = _get_model(model_name).generate_content(prompt)
+                return response.text
+            except Exception as e:
+                if _is_overloaded(e):
+                    print(f"  -> WARNING: Model '{model_name}' is overloaded or rate limited, trying the next one...")
+                    continue
                 print(f"ERROR: An unhandled error occurred while calling the Gemini API: {e}")
-                return None 
-    
+                return None
+
+        wait_time = 5 * (attempt + 1)
+        print(f"  -> WARNING: All models are overloaded. Waiting for {wait_time}s... (Attempt {attempt + 1}/{max_retries})")
+        time.sleep(wait_time)
+
     print("ERROR: Failed to get a response from Gemini API after multiple retries.")
-    return None
\ No newline at end of file
+    return None
@@ -1,56 +1,364 @@
-import chromadb
-from sentence_transformers import SentenceTransformer
+import argparse
+import functools
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
 from pathlib import Path
-import uuid
+from .lexical_index import LexicalIndex, is_identifier_query
+
+# chromadb, sentence_transformers (torch) and numpy take seconds to import, so
+# they are only imported when memory is first used, not when this module is.
+
+DEFAULT_EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+COLLECTION_NAME = "contextual_memory"
+_STAGING_COLLECTION_NAME = COLLECTION_NAME + "_compacting"
+
+# Default retention policy. A company can override any of these keys through
+# the "memory_policy" section of its manifest.json.
+DEFAULT_MEMORY_POLICY = {
+    # Cosine similarity above which a new memory replaces an existing one, as
+    # a newer version of the same fact (None = always store both).
+    "near_duplicate_threshold": 0.95,
+    # Memories not seen or recalled for this many days may expire (None = never).
+    "ttl_days": None,
+    # Memories at or above this importance never expire through the TTL.
+    "min_importance": 0.5,
+    # Upper bound on stored memories (None = unbounded).
+    "max_entries": None,
+    # When max_entries is exceeded, trim down to this fraction of it so the
+    # retention pass does not run again on every following insert.
+    "low_watermark": 0.9,
+}
+DEFAULT_IMPORTANCE = 0.5
+
+# Default storage settings. A company can override any of these keys through
+# the "memory_storage" section of its manifest.json.
+#
+# Disk cost per memory in the flat store, for D-dimensional embeddings
+# (D = 384 for the default model) kept to d dimensions:
+#   float32        4 * d bytes          (1536 B at d = 384)
+#   float16        2 * d bytes          ( 768 B)
+#   int8           d + 4 bytes          ( 388 B; 132 B at d = 128)
+#   rerank sidecar 2 * D bytes on top   ( 768 B), except for untruncated float32
+DEFAULT_STORAGE = {
+    # "chroma" keeps the ChromaDB collection; "flat" uses FlatVectorStore.
+    "backend": "chroma",
+    # Element type of the stored vectors: float32, float16 or int8 (flat only).
+    "dtype": "float32",
+    # Keep only the first N embedding dimensions (None = all of them; flat only).
+    "dims": None,
+    # Candidates rescored against a float16 sidecar with every dimension after
+    # the compact scan, to recover recall lost to int8 or truncation. 0 turns
+    # the rerank pass and its sidecar file off (flat only; never needed for
+    # untruncated float32).
+    "rerank_candidates": 0,
+}
+_COMPACTION_BATCH_SIZE = 512
+# Recalling a memory refreshes its last_seen_at at most this often, keeping
+# metadata writes off the read path (TTLs are measured in days).
+_SEEN_REFRESH_INTERVAL_S = 3600
+# Constant of the reciprocal rank fusion used to merge lexical and vector hits.
+_RRF_K = 60
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def content_hash(text: str) -> str:
+    """Stable id for a memory, insensitive to case and whitespace changes."""
+    return hashlib.sha256(_normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def _sanitize_metadata(metadata: dict) -> dict:
+    """ChromaDB only accepts scalar metadata values; serialize anything else."""
+    sanitized = {}
+    for key, value in metadata.items():
+        if value is None:
+            continue
+        if isinstance(value, (str, int, float, bool)):
+            sanitized[str(key)] = value
+        else:
+            sanitized[str(key)] = json.dumps(value, default=str)
+    return sanitized
+
+
+def _synchronized(method):
+    """Runs a MemoryManager method under the manager's lock."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class MemoryManager:
     """
-    Manages the long-term contextual memory for a company using ChromaDB.
+    Manages the long-term contextual memory for a company using ChromaDB,
+    or a compact local FlatVectorStore when configured to.
+
+    The database and the embedding model are opened on first use, so creating
+    a company does not pay for them until an agent actually needs its memory.
+
+    Its public methods are serialized with a lock: memory tools run on a
+    thread pool, and one that timed out may still be running when the agent
+    calls the next one. The stores behind it are not thread-safe.
     """
-    def __init__(self, company_root: Path):
+    def __init__(self, company_root: Path, embedding_model=None, memory_policy: dict = None, memory_storage: dict = None):
+        """
+        Args:
+            company_root: The company's workspace directory.
+            embedding_model: Optional object exposing `encode(text)`, such as a
+                             shared `EmbeddingClient`. When omitted, a local
+                             SentenceTransformer model is loaded.
+            memory_policy: Overrides for DEFAULT_MEMORY_POLICY.
+            memory_storage: Overrides for DEFAULT_STORAGE, selecting the
+                            vector backend and its compression.
+        """
+        self.policy = {**DEFAULT_MEMORY_POLICY, **(memory_policy or {})}
+        self.storage = {**DEFAULT_STORAGE, **(memory_storage or {})}
+
         # Persist the memory database within the company's workspace directory
-        db_path = company_root / "memory" / "chroma_db"
-        self.client = chromadb.PersistentClient(path=str(db_path))
-        
-        # Initialize the model for creating vector embeddings
-        # 'all-MiniLM-L6-v2' is a good, lightweight default model.
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        # Get or create a collection for this company's memory
-        self.collection = self.client.get_or_create_collection(name="contextual_memory")
-        print(f"--- MemoryManager initialized. Using DB at: {db_path} ---")
-
-    def memorize(self, text: str, metadata: dict = None):
+        if self.storage["backend"] == "flat":
+            self.db_path = company_root / "memory" / "flat_index"
+        elif self.storage["backend"] == "chroma":
+            self.db_path = company_root / "memory" / "chroma_db"
+        else:
+            raise ValueError(f"Unknown memory storage backend '{self.storage['backend']}'.")
+        self._index_path = company_root / "memory" / "lexical_index.json"
+
+        # A shared model (e.g. the multi-company runtime's embedding service)
+        # may be passed in; otherwise one is loaded on first use.
+        self._embedding_model = embedding_model
+        self.client = None
+        self._collection = None
+        self._lexical_index = None
+        self._lock = threading.RLock()
+
+    @property
+    def embedding_model(self):
+        if self._embedding_model is None:
+            from sentence_transformers import SentenceTransformer
+            # 'all-MiniLM-L6-v2' is a good, lightweight default model.
+            self._embedding_model = SentenceTransformer(DEFAULT_EMBEDDING_MODEL)
+        return self._embedding_model
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            # Get or create a collection for this company's memory
+            self._collection = self._open_collection()
+            # BM25 index over the same documents, for exact identifier lookups.
+            if len(self.lexical_index) != self._collection.count():
+                self._rebuild_lexical_index()
+            print(f"--- MemoryManager initialized. Using DB at: {self.db_path} ---")
+        return self._collection
+
+    @property
+    def lexical_index(self) -> LexicalIndex:
+        if self._lexical_index is None:
+            self._lexical_index = LexicalIndex(self._index_path)
+        return self._lexical_index
+
+    def _open_collection(self, staging: bool = False):
+        """
+        Opens the collection, or with `staging` a fresh, empty one that
+        compaction fills before swapping it in with `_swap_in_staging`.
+        """
+        if self.storage["backend"] == "flat":
+            from .vector_store import FlatVectorStore
+            if staging:
+                shutil.rmtree(self._flat_staging_path, ignore_errors=True)
+            else:
+                self._recover_flat_swap()
+            return FlatVectorStore(
+                self._flat_staging_path if staging else self.db_path,
+                dtype=self.storage["dtype"],
+                dims=self.storage["dims"],
+                rerank_candidates=self.storage["rerank_candidates"],
+            )
+        if self.client is None:
+            import chromadb
+            self.client = chromadb.PersistentClient(path=str(self.db_path))
+        names = {getattr(collection, 'name', collection) for collection in self.client.list_collections()}
+        if staging:
+            if _STAGING_COLLECTION_NAME in names:
+                self.client.delete_collection(name=_STAGING_COLLECTION_NAME)
+            return self.client.create_collection(name=_STAGING_COLLECTION_NAME)
+        if COLLECTION_NAME not in names and _STAGING_COLLECTION_NAME in names:
+            # A compaction was interrupted after dropping the old collection;
+            # the staging one is complete, so finish the swap.
+            self.client.get_collection(name=_STAGING_COLLECTION_NAME).modify(name=COLLECTION_NAME)
+        return self.client.get_or_create_collection(name=COLLECTION_NAME)
+
+    @property
+    def _flat_staging_path(self) -> Path:
+        return self.db_path.with_name(self.db_path.name + ".compacting")
+
+    @property
+    def _flat_retired_path(self) -> Path:
+        return self.db_path.with_name(self.db_path.name + ".old")
+
+    def _recover_flat_swap(self):
+        """Completes or rolls back a flat store swap cut short by a crash."""
+        staging, retired = self._flat_staging_path, self._flat_retired_path
+        if not self.db_path.exists() and retired.exists():
+            # The old store was moved aside, so the staging store is complete.
+            os.replace(staging if staging.exists() else retired, self.db_path)
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.rmtree(retired, ignore_errors=True)
+
+    def _swap_in_staging(self, staging_collection):
+        """Replaces the live collection with a fully written staging one."""
+        if self.storage["backend"] == "flat":
+            os.replace(self.db_path, self._flat_retired_path)
+            os.replace(self._flat_staging_path, self.db_path)
+            shutil.rmtree(self._flat_retired_path, ignore_errors=True)
+            self._collection = self._open_collection()
+        else:
+            self.client.delete_collection(name=COLLECTION_NAME)
+            staging_collection.modify(name=COLLECTION_NAME)
+            self._collection = staging_collection
+
+    def _rebuild_lexical_index(self):
+        stored = self.collection.get(include=["documents"])
+        self.lexical_index.rebuild(stored['ids'], stored['documents'])
+        print(f"--- Rebuilt lexical index over {len(stored['ids'])} memories ---")
+
+    def _embed(self, text: str) -> list[float]:
+        return self.embedding_model.encode(text).tolist()
+
+    def _mark_seen(self, doc_id: str, metadata: dict, importance: float):
+        """Refreshes an existing memory instead of storing a second copy."""
+        updated = dict(metadata)
+        updated['times_seen'] = int(updated.get('times_seen', 1)) + 1
+        updated['last_seen_at'] = time.time()
+        updated['importance'] = max(float(updated.get('importance', DEFAULT_IMPORTANCE)), importance)
+        self.collection.update(ids=[doc_id], metadatas=[updated])
+
+    def _find_near_duplicate(self, embedding: list[float]) -> tuple[str, str, dict] | None:
+        threshold = self.policy.get("near_duplicate_threshold")
+        if not threshold or self.collection.count() == 0:
+            return None
+
+        results = self.collection.query(
+            query_embeddings=[embedding],
+            n_results=1,
+            include=["documents", "metadatas", "distances"],
+        )
+        if not results.get('ids') or not results['ids'][0]:
+            return None
+
+        # The collection uses squared L2 distance over unit-length embeddings,
+        # where distance = 2 - 2 * cosine_similarity.
+        similarity = 1 - results['distances'][0][0] / 2
+        if similarity < threshold:
+            return None
+        return results['ids'][0][0], results['documents'][0][0], results['metadatas'][0][0] or {}
+
+    @_synchronized
+    def memorize(self, text: str, metadata: dict = None) -> dict | None:
         """
         Embeds a piece of text and stores it in the vector database.
 
+        Identical text (ignoring case and whitespace) is never stored twice.
+        Text whose embedding is nearly identical to an existing memory is
+        taken to be a newer version of it (e.g. a fact with one number
+        changed) and replaces it, keeping its usage history.
+
         Args:
             text: The string of text to be memorized.
             metadata: A dictionary of metadata to associate with the text,
                       e.g., {'source': 'file.txt', 'agent_id': 'xyz'}.
+                      An optional numeric 'importance' (0-1) protects the
+                      memory from retention.
+
+        Returns:
+            None for empty text, otherwise a dictionary with the "outcome"
+            ("added", "duplicate" or "replaced") and the stored "document".
+            A replacement also carries the "previous" text it superseded.
         """
         if not text.strip():
-            return # Don't memorize empty strings
+            return None # Don't memorize empty strings
+
+        metadata = _sanitize_metadata(metadata or {})
+        try:
+            importance = float(metadata.get('importance', DEFAULT_IMPORTANCE))
+        except ValueError:
+            importance = DEFAULT_IMPORTANCE
+
+        # The content hash doubles as the document id, so exact repeats are a
+        # cheap primary-key lookup that needs no embedding at all.
+        doc_id = content_hash(text)
+        existing = self.collection.get(ids=[doc_id], include=["documents", "metadatas"])
+        if existing.get('ids'):
+            self._mark_seen(doc_id, existing['metadatas'][0] or {}, importance)
+            print(f"--- Memory already known, refreshed it. Source: {metadata.get('source', 'unknown')} ---")
+            return {"outcome": "duplicate", "document": existing['documents'][0]}
 
-        # Generate a unique ID for this memory entry
-        doc_id = str(uuid.uuid4())
-        
         # Create the vector embedding from the text
-        embedding = self.embedding_model.encode(text).tolist()
-        
+        embedding = self._embed(text)
+
+        now = time.time()
+        metadata.update({
+            'content_hash': doc_id,
+            'created_at': now,
+            'last_seen_at': now,
+            'times_seen': 1,
+            'importance': importance,
+        })
+
+        near_duplicate = self._find_near_duplicate(embedding)
+        if near_duplicate:
+            previous_id, previous_text, previous_metadata = near_duplicate
+            metadata['created_at'] = float(previous_metadata.get('created_at', now))
+            metadata['times_seen'] = int(previous_metadata.get('times_seen', 1)) + 1
+            metadata['importance'] = max(float(previous_metadata.get('importance', DEFAULT_IMPORTANCE)), importance)
+
         # Store the document, its embedding, and metadata in the collection
         self.collection.add(
             embeddings=[embedding],
             documents=[text],
-            metadatas=[metadata] if metadata else [{}],
+            metadatas=[metadata],
             ids=[doc_id]
         )
+        self.lexical_index.add(doc_id, text)
+        if near_duplicate:
+            # Dropped only after the new version is stored, so a crash in
+            # between leaves both rather than neither.
+            self.collection.delete(ids=[previous_id])
+            self.lexical_index.remove([previous_id])
+            print(f"--- Replaced near-duplicate memory {previous_id[:12]} with newer text. Source: {metadata.get('source', 'unknown')} ---")
+            return {"outcome": "replaced", "document": text, "previous": previous_text}
         print(f"--- Memorized new context. Source: {metadata.get('source', 'unknown')} ---")
 
+        max_entries = self.policy.get("max_entries")
+        if max_entries and self.collection.count() > max_entries:
+            self.apply_retention()
+        return {"outcome": "added", "document": text}
+
+    def _vector_search(self, query: str, n_results: int) -> list[str]:
+        query_embedding = self._embed(query)
+        results = self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            include=["distances"],
+        )
+        return results['ids'][0] if results.get('ids') else []
+
+    @_synchronized
     def recall(self, query: str, n_results: int = 5) -> list[dict]:
         """
         Searches the memory for context relevant to a query.
 
+        Identifier-like queries (task or agent ids, file or table names) are
+        answered from the lexical index alone when a memory contains the whole
+        identifier, skipping the embedding model. Other queries fuse lexical
+        and vector rankings.
+
         Args:
             query: The natural language query to search for.
             n_results: The maximum number of results to return.
@@ -61,23 +369,172 @@ class MemoryManager:
         if not query.strip():
             return []
 
-        # Create a vector embedding for the search query
-        query_embedding = self.embedding_model.encode(query).tolist()
-        
-        # Query the collection for the most similar documents
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results
-        )
-        
-        # Format and return the results
+        stored_count = self.collection.count()
+        if stored_count == 0:
+            return []
+
+        candidate_count = min(n_results * 2, stored_count)
+        lexical_ids = [doc_id for doc_id, _ in self.lexical_index.search(query, candidate_count)]
+
+        # Only a document containing the whole identifier makes the lexical
+        # ranking trustworthy on its own; hits on its parts ("agent", "001")
+        # are fused with the vector ranking like any other query.
+        if lexical_ids and is_identifier_query(query) and self.lexical_index.has_token(query.strip()):
+            ranked_ids = lexical_ids[:n_results]
+        else:
+            vector_ids = self._vector_search(query, candidate_count)
+            # Reciprocal rank fusion: documents ranked well by either retriever
+            # rise to the top, and those ranked well by both rise the most.
+            fused: dict[str, float] = {}
+            for ranking in (vector_ids, lexical_ids):
+                for rank, doc_id in enumerate(ranking):
+                    fused[doc_id] = fused.get(doc_id, 0.0) + 1 / (_RRF_K + rank + 1)
+            ranked_ids = sorted(fused, key=fused.get, reverse=True)[:n_results]
+
         recalled_memories = []
-        if results and results.get('documents'):
-            for i, doc in enumerate(results['documents'][0]):
-                recalled_memories.append({
-                    "document": doc,
-                    "metadata": results['metadatas'][0][i]
-                })
-        
+        if ranked_ids:
+            stored = self.collection.get(ids=ranked_ids, include=["documents", "metadatas"])
+            by_id = {doc_id: (stored['documents'][i], stored['metadatas'][i] or {}) for i, doc_id in enumerate(stored['ids'])}
+            ranked_ids = [doc_id for doc_id in ranked_ids if doc_id in by_id]
+            for doc_id in ranked_ids:
+                document, metadata = by_id[doc_id]
+                recalled_memories.append({"document": document, "metadata": metadata})
+
+            # Recalled memories count as "seen", which keeps them from expiring.
+            now = time.time()
+            stale_ids = [
+                doc_id for doc_id in ranked_ids
+                if now - float(by_id[doc_id][1].get('last_seen_at', 0)) > _SEEN_REFRESH_INTERVAL_S
+            ]
+            if stale_ids:
+                refreshed = [{**by_id[doc_id][1], 'last_seen_at': now} for doc_id in stale_ids]
+                self.collection.update(ids=stale_ids, metadatas=refreshed)
+
         print(f"--- Recalled {len(recalled_memories)} memories for query: '{query[:50]}...' ---")
-        return recalled_memories
\ No newline at end of file
+        return recalled_memories
+
+    def _select_retained(self, ids: list[str], metadatas: list[dict], now: float) -> set[str]:
+        """Applies the TTL and size limits of the policy, returning the ids to keep."""
+        ttl_days = self.policy.get("ttl_days")
+        min_importance = self.policy.get("min_importance", DEFAULT_IMPORTANCE)
+
+        candidates = []
+        for doc_id, meta in zip(ids, metadatas):
+            meta = meta or {}
+            importance = float(meta.get('importance', DEFAULT_IMPORTANCE))
+            last_seen_at = float(meta.get('last_seen_at', meta.get('created_at', now)))
+            if ttl_days and importance < min_importance and now - last_seen_at > ttl_days * 86400:
+                continue
+            candidates.append((importance, last_seen_at, doc_id))
+
+        max_entries = self.policy.get("max_entries")
+        if max_entries and len(candidates) > max_entries:
+            keep_count = int(max_entries * self.policy.get("low_watermark", 1.0))
+            # Most important first, most recently seen breaking ties.
+            candidates.sort(reverse=True)
+            candidates = candidates[:keep_count]
+
+        return {doc_id for _, _, doc_id in candidates}
+
+    @_synchronized
+    def apply_retention(self) -> int:
+        """
+        Deletes memories that expired or fall outside the size limit.
+
+        Returns:
+            The number of memories removed.
+        """
+        stored = self.collection.get(include=["metadatas"])
+        keep = self._select_retained(stored['ids'], stored['metadatas'], time.time())
+        to_delete = [doc_id for doc_id in stored['ids'] if doc_id not in keep]
+        if to_delete:
+            self.collection.delete(ids=to_delete)
+            self.lexical_index.remove(to_delete)
+            print(f"--- Retention removed {len(to_delete)} memories ---")
+        return len(to_delete)
+
+    @_synchronized
+    def compact(self) -> dict:
+        """
+        Rebuilds the collection from scratch.
+
+        Collapses exact duplicates (including entries stored before content-hash
+        ids existed), applies the retention policy and writes the result to a
+        new collection that replaces the old one once it is complete. This also
+        rebuilds the HNSW index without the space left by deletions. A flat
+        store drops its deleted rows and adopts the configured storage settings.
+        The lexical index is rebuilt alongside it.
+        This is meant to run offline, while no agent is using the memory.
+
+        Returns:
+            A dictionary with the entry counts before and after compaction.
+        """
+        stored = self.collection.get(include=["embeddings", "documents", "metadatas"])
+        before = len(stored['ids'])
+
+        # Collapse exact duplicates, folding their usage stats into one entry.
+        merged: dict[str, dict] = {}
+        for i, document in enumerate(stored['documents']):
+            doc_hash = content_hash(document)
+            meta = dict(stored['metadatas'][i] or {})
+            if doc_hash in merged:
+                kept = merged[doc_hash]['metadata']
+                kept['times_seen'] = int(kept.get('times_seen', 1)) + int(meta.get('times_seen', 1))
+                kept['last_seen_at'] = max(float(kept.get('last_seen_at', 0)), float(meta.get('last_seen_at', 0)))
+                kept['importance'] = max(float(kept.get('importance', DEFAULT_IMPORTANCE)), float(meta.get('importance', DEFAULT_IMPORTANCE)))
+                continue
+            now = time.time()
+            meta.setdefault('content_hash', doc_hash)
+            meta.setdefault('created_at', now)
+            meta.setdefault('last_seen_at', meta['created_at'])
+            meta.setdefault('times_seen', 1)
+            meta.setdefault('importance', DEFAULT_IMPORTANCE)
+            merged[doc_hash] = {
+                "document": document,
+                "embedding": list(stored['embeddings'][i]),
+                "metadata": meta,
+            }
+
+        keep = self._select_retained(list(merged), [entry['metadata'] for entry in merged.values()], time.time())
+        entries = [(doc_id, merged[doc_id]) for doc_id in merged if doc_id in keep]
+
+        # Write the compacted entries to a staging collection and only then
+        # swap it in, so an interrupted compaction never loses memories.
+        staging = self._open_collection(staging=True)
+        for start in range(0, len(entries), _COMPACTION_BATCH_SIZE):
+            batch = entries[start:start + _COMPACTION_BATCH_SIZE]
+            staging.add(
+                ids=[doc_id for doc_id, _ in batch],
+                embeddings=[entry['embedding'] for _, entry in batch],
+                documents=[entry['document'] for _, entry in batch],
+                metadatas=[entry['metadata'] for _, entry in batch],
+            )
+        self._swap_in_staging(staging)
+        self.lexical_index.rebuild([doc_id for doc_id, _ in entries], [entry['document'] for _, entry in entries])
+
+        stats = {"before": before, "after": len(entries)}
+        print(f"--- Compacted memory: {before} -> {len(entries)} entries ---")
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline maintenance for a company's long-term memory.")
+    parser.add_argument("command", choices=["compact", "retention"])
+    parser.add_argument("company_path", type=Path, help="Path to the company's workspace directory.")
+    args = parser.parse_args()
+
+    manifest_path = args.company_path / "manifest.json"
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8')) if manifest_path.is_file() else {}
+    memory = MemoryManager(
+        args.company_path,
+        memory_policy=manifest.get('memory_policy'),
+        memory_storage=manifest.get('memory_storage'),
+    )
+    if args.command == "compact":
+        memory.compact()
+    else:
+        memory.apply_retention()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,114 @@
 import json
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from typing import TYPE_CHECKING
 from .vfs import FileSystemManager
 from .task import Task, TaskStatus # Import TaskStatus
+from .trace import get_tracer
+from .events import event_bus
 
 if TYPE_CHECKING:
     from .company import Company 
     from .task import Task
 
+# --- Tool Registration ---
+
+# What a tool can ask to receive, ahead of its payload, in the order it lists them.
+TOOL_DEPENDENCIES = ("fs", "memory", "company", "task")
+# Where a tool runs: on the caller's thread, in the shared file I/O thread
+# pool, or in a small separate pool for compute-bound work such as embedding
+# model encodes, so a slow encode never occupies a file I/O worker. Encodes
+# release the GIL and need the live memory store, so threads suffice there.
+TOOL_EXECUTORS = ("inline", "io", "cpu")
+_POOL_SIZES = {"io": 8, "cpu": 2}
+
+class ToolSpec:
+    """Describes a registered tool and how the dispatcher must run it."""
+    def __init__(self, name: str, function, requires: tuple[str, ...], executor: str, timeout: float | None,
+                 description: str, required_params: tuple[str, ...]):
+        self.name = name
+        self.function = function
+        self.requires = requires
+        self.executor = executor
+        self.timeout = timeout
+        self.description = description
+        self.required_params = required_params
+
+    def __repr__(self) -> str:
+        return f"<ToolSpec name='{self.name}' executor='{self.executor}' timeout={self.timeout}>"
+
+TOOL_REGISTRY: dict[str, ToolSpec] = {}
+
+def register_tool(name: str, requires: tuple[str, ...] = ("fs",), executor: str = "inline", timeout: float | None = None,
+                  description: str = "No description available.", required_params: tuple[str, ...] = ()):
+    """
+    Decorator that adds a tool to TOOL_REGISTRY.
+
+    The tool is called as function(*dependencies, payload), where the
+    dependencies are taken from `requires` (see TOOL_DEPENDENCIES).
+
+    Args:
+        name: The tool name agents use in their plans.
+        requires: The services the tool needs, in argument order.
+        executor: One of TOOL_EXECUTORS.
+        timeout: Seconds to wait for a pooled tool before reporting an error.
+                 Inline tools run to completion on the caller's thread.
+        description: The text shown to agents in their tool manifest.
+        required_params: Payload keys validated before the plan runs.
+    """
+    unknown = set(requires) - set(TOOL_DEPENDENCIES)
+    if unknown:
+        raise ValueError(f"Tool '{name}' requires unknown dependencies: {sorted(unknown)}.")
+    if executor not in TOOL_EXECUTORS:
+        raise ValueError(f"Tool '{name}' has unknown executor '{executor}'. Expected one of {TOOL_EXECUTORS}.")
+
+    def decorator(function):
+        TOOL_REGISTRY[name] = ToolSpec(name, function, tuple(requires), executor, timeout, description, tuple(required_params))
+        return function
+    return decorator
+
+_executors: dict = {}
+
+def _get_executor(kind: str):
+    """Returns the shared pool for an executor kind, creating it on first use."""
+    if kind not in _executors:
+        _executors[kind] = ThreadPoolExecutor(max_workers=_POOL_SIZES[kind], thread_name_prefix=f"tool-{kind}")
+    return _executors[kind]
+
+def dispatch_tool(spec: ToolSpec, payload: dict, company: "Company", current_task: "Task"):
+    """
+    Runs a tool on its executor and enforces its timeout.
+
+    A timed-out tool is reported as an error, but a thread cannot be stopped
+    from outside, so a pooled tool may still finish in the background. Tools
+    must therefore only touch state that is safe to share with the next
+    tool; MemoryManager serializes its calls with a lock for this reason.
+    """
+    services = {"fs": company.fs, "memory": company.memory, "company": company, "task": current_task}
+    args = [services[name] for name in spec.requires] + [payload]
+    if spec.executor == "inline":
+        return spec.function(*args)
+
+    future = _get_executor(spec.executor).submit(spec.function, *args)
+    try:
+        return future.result(timeout=spec.timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        return {"status": "error", "message": f"Tool '{spec.name}' timed out after {spec.timeout}s."}
+
 # --- Tool Implementations ---
 
+@register_tool("CREATE_FILE", executor="io", timeout=30,
+               description="Creates a new, empty file. Payload requires 'path'.",
+               required_params=("path",))
 def create_file(fs: FileSystemManager, payload: dict):
     path = payload.get("path") or payload.get("filepath")
     if not path: return {"status": "error", "message": "Payload must include 'path'."}
     fs.write_file(path, "")
     return {"status": "success", "message": f"File created at '{path}'."}
 
+@register_tool("WRITE_FILE", executor="io", timeout=30,
+               description="Writes or appends content. Payload requires 'path' and 'content'. Optional: 'append': true.",
+               required_params=("path", "content"))
 def write_file(fs: FileSystemManager, payload: dict):
     path = payload.get("path") or payload.get("filepath")
     content = payload.get("content")
@@ -24,6 +118,9 @@ def write_file(fs: FileSystemManager, payload: dict):
     if should_append: return {"status": "success", "message": f"Content appended to '{path}'."}
     else: return {"status": "success", "message": f"Content written to '{path}'."}
 
+@register_tool("READ_FILE", executor="io", timeout=30,
+               description="Reads a file's content. Payload requires 'path'.",
+               required_params=("path",))
 def read_file(fs: FileSystemManager, payload: dict):
     path = payload.get("path") or payload.get("filepath")
     if not path: return {"status": "error", "message": "Payload must include 'path'."}
@@ -31,6 +128,9 @@ def read_file(fs: FileSystemManager, payload: dict):
     if content is None: return {"status": "error", "message": f"File not found at '{path}'."}
     return {"status": "success", "content": content}
 
+@register_tool("MEMORIZE_THIS", requires=("memory",), executor="cpu", timeout=60,
+               description="Adds text to your long-term memory. Payload requires 'text', and an optional 'metadata' dictionary.",
+               required_params=("text",))
 def memorize_this(memory: "MemoryManager", payload: dict):
     """Tool to add a piece of text to long-term memory."""
     text = payload.get("text")
@@ -38,9 +138,16 @@ def memorize_this(memory: "MemoryManager", payload: dict):
     if not text:
         return {"status": "error", "message": "Payload must include 'text'."}
     
-    memory.memorize(text, metadata)
+    stored = memory.memorize(text, metadata)
+    if stored and stored["outcome"] == "duplicate":
+        return {"status": "success", "message": "Information was already in memory; it has been refreshed.", "memory": stored["document"]}
+    if stored and stored["outcome"] == "replaced":
+        return {"status": "success", "message": "This replaced a nearly identical, older memory.", "memory": stored["document"], "replaced": stored["previous"]}
     return {"status": "success", "message": "Information memorized."}
 
+@register_tool("RECALL_CONTEXT", requires=("memory",), executor="cpu", timeout=60,
+               description="Searches your long-term memory based on a query. Payload requires 'query'.",
+               required_params=("query",))
 def recall_context(memory: "MemoryManager", payload: dict):
     """Tool to recall relevant context from long-term memory."""
     query = payload.get("query")
@@ -50,9 +157,18 @@ def recall_context(memory: "MemoryManager", payload: dict):
     results = memory.recall(query)
     return {"status": "success", "results": results}
 
-# Note the forward reference string "Company" in the type hint
+# Note the forward reference string "Company" in the type hint.
+# Delegation changes the company's task graph, so it stays on the caller's thread.
+@register_tool("DELEGATE_TASK", requires=("company", "task"),
+               description="Delegates a task to another agent. Payload requires 'assignee_id', 'description'. Optional: 'block_self': true.",
+               required_params=("assignee_id", "description"))
 def delegate_task(company: "Company", current_task: "Task", payload: dict):
-    """Tool to delegate a new task and optionally block the current task."""
+    """
+    Tool to delegate a new task and optionally block the current task.
+
+    Delegating the same work to the same agent again (e.g. from a retried
+    iteration) reuses the existing sub-task instead of creating a duplicate.
+    """
     assignee_id = payload.get("assignee_id")
     description = payload.get("description")
     block_self = payload.get("block_self", False) # New optional flag
@@ -60,8 +176,25 @@ def delegate_task(company: "Company", current_task: "Task", payload: dict):
     if not assignee_id or not description:
         return {"status": "error", "message": "Payload must include 'assignee_id' and 'description'."}
     
+    existing_task = company.find_equivalent_task(description, assignee_id, current_task.task_id)
+    if existing_task is not None:
+        print(f"  -> Reusing existing sub-task {existing_task.task_id} ({existing_task.status.value}).")
+        if existing_task.status == TaskStatus.COMPLETED:
+            return {"status": "success", "message": f"Task '{existing_task.task_id}' was already delegated to '{assignee_id}' and is COMPLETED. Use its deliverables instead of delegating again."}
+        if block_self:
+            if existing_task.task_id not in current_task.dependencies:
+                current_task.dependencies.append(existing_task.task_id)
+            current_task.set_status(TaskStatus.BLOCKED, f"Blocked pending completion of sub-task {existing_task.task_id[:8]}")
+            return {"status": "success", "message": f"Task '{existing_task.task_id}' was already delegated to '{assignee_id}'. Current task is now BLOCKED."}
+        return {"status": "success", "message": f"Task '{existing_task.task_id}' was already delegated to '{assignee_id}' and is {existing_task.status.value}."}
+
     try:
-        new_task = company.create_task(description=description, assignee_id=assignee_id)
+        new_task = company.create_task(
+            description=description,
+            assignee_id=assignee_id,
+            delegator_id=current_task.assignee_id,
+            parent_task=current_task,
+        )
         
         if block_self:
             # Add the new task as a dependency for the current task
@@ -73,6 +206,8 @@ def delegate_task(company: "Company", current_task: "Task", payload: dict):
     except ValueError as e:
         return {"status": "error", "message": str(e)}
 
+@register_tool("LIST_FILES", executor="io", timeout=30,
+               description="Lists files in a directory. Optional payload: 'path'.")
 def list_files(fs: FileSystemManager, payload: dict):
     """Tool to list files and directories at a given path."""
     path = payload.get("path", ".") # Default to current directory
@@ -83,43 +218,75 @@ def list_files(fs: FileSystemManager, payload: dict):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-# --- Tool Registry ---
-TOOL_REGISTRY = {
-    "CREATE_FILE": create_file,
-    "WRITE_FILE": write_file,
-    "READ_FILE": read_file,
-    "LIST_FILES": list_files,
-    "DELEGATE_TASK": delegate_task,
-    "MEMORIZE_THIS": memorize_this,
-    "RECALL_CONTEXT": recall_context,
-}
+# --- Plan Validation ---
+
+# Alternative payload keys tools accept for a required parameter.
+PARAM_ALIASES = {"path": ["filepath"]}
+
+
+def validate_actions(actions) -> list[str]:
+    """
+    Checks a plan's actions against the tool registry before anything runs.
+
+    Returns:
+        A list of human-readable problems; empty if the actions are valid.
+    """
+    if not isinstance(actions, list):
+        return ["'actions' must be a list."]
+
+    errors = []
+    for i, action in enumerate(actions):
+        label = f"Action {i+1}"
+        if not isinstance(action, dict):
+            errors.append(f"{label} must be an object with 'tool_name' and 'payload'.")
+            continue
+        tool_name = action.get("tool_name")
+        if tool_name not in TOOL_REGISTRY:
+            errors.append(f"{label}: unknown tool '{tool_name}'. Valid tools: {', '.join(TOOL_REGISTRY)}.")
+            continue
+        payload = action.get("payload", {})
+        if not isinstance(payload, dict):
+            errors.append(f"{label} ({tool_name}): 'payload' must be an object.")
+            continue
+        for param in TOOL_REGISTRY[tool_name].required_params:
+            names = [param] + PARAM_ALIASES.get(param, [])
+            if all(payload.get(name) is None for name in names):
+                errors.append(f"{label} ({tool_name}): payload is missing '{param}'.")
+    return errors
 
 
 # --- Orchestrator Execution Engine ---
 def execute_actions(actions: list, company: "Company", current_task: "Task"):
     """Executes actions, passing the company and current_task to tools."""
     print("\n--- Orchestrator is executing actions ---")
+    tracer = get_tracer()
     execution_results = []
     for i, action in enumerate(actions):
         tool_name = action.get("tool_name")
         payload = action.get("payload", {})
         
         print(f"Action {i+1}: Executing tool '{tool_name}'...")
-        tool_function = TOOL_REGISTRY.get(tool_name)
+        tool_spec = TOOL_REGISTRY.get(tool_name)
         
-        if not tool_function:
+        replayed = tracer.replay_tool(tool_name, payload) if tracer else None
+        if replayed is not None:
+            result = replayed
+        elif not tool_spec:
             result = {"status": "error", "message": f"Tool '{tool_name}' not found in registry."}
         else:
             try:
-                # Route the tool call to the correct service (VFS, Memory, or Company)
-                if tool_name in ["MEMORIZE_THIS", "RECALL_CONTEXT"]:
-                    result = tool_function(company.memory, payload)
-                elif tool_name == "DELEGATE_TASK":
-                    result = tool_function(company, current_task, payload)
-                else: # Default to filesystem tools
-                    result = tool_function(company.fs, payload)
+                # The tool's spec decides which services it gets and where it runs
+                result = dispatch_tool(tool_spec, payload, company, current_task)
             except Exception as e:
                 result = {"status": "fatal_error", "message": str(e)}
+        if tracer:
+            tracer.record_tool(tool_name, payload, result)
+        event_bus.publish(
+            "tool.finished",
+            task_id=current_task.task_id,
+            tool_name=tool_name,
+            status=result.get("status") if isinstance(result, dict) else "error",
+        )
 
         # Robust logging that handles any result, including None, without crashing.
         if result is None:
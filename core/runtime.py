@@ -0,0 +1,323 @@
+# core/runtime.py
+
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from .company import Company, discover_companies
+from .memory import DEFAULT_EMBEDDING_MODEL
+from .task import TaskStatus
+from .trace import get_tracer, set_tracer, tracer_from_env, tracing_enabled
+
+# --- Shared Embedding Service ---
+
+def _embedding_service_loop(model_name: str, requests, reply_queues: dict, max_batch_size: int, max_wait_s: float):
+    """
+    Runs inside the embedding service process.
+
+    Collects encode requests from every worker, groups whatever arrives within
+    `max_wait_s` into one batch and answers each worker on its own reply queue.
+    """
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(model_name)
+    print(f"--- Embedding service ready (model: {model_name}, pid: {os.getpid()}) ---")
+
+    stopping = False
+    while not stopping:
+        first = requests.get()
+        if first is None:
+            break
+
+        batch = [first]
+        deadline = time.monotonic() + max_wait_s
+        while len(batch) < max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                stopping = True
+                break
+            batch.append(item)
+
+        texts = [text for _, _, text in batch]
+        try:
+            embeddings = model.encode(texts, batch_size=max_batch_size)
+            for (client_id, request_id, _), embedding in zip(batch, embeddings):
+                reply_queues[client_id].put((request_id, embedding, None))
+        except Exception as e:
+            for client_id, request_id, _ in batch:
+                reply_queues[client_id].put((request_id, None, str(e)))
+
+
+class EmbeddingClient:
+    """
+    Worker-side handle to the shared embedding service.
+
+    Exposes the same `encode()` call as a SentenceTransformer model, so it can
+    be handed to `MemoryManager` in place of a locally loaded model.
+    """
+    def __init__(self, client_id: str, requests, replies, timeout: float = 120.0):
+        self.client_id = client_id
+        self._requests = requests
+        self._replies = replies
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock'] # Locks cannot cross process boundaries
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def encode(self, sentences):
+        """Encodes a string (or a list of strings) through the shared service."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        with self._lock:
+            request_ids = []
+            for text in texts:
+                request_id = uuid.uuid4().hex
+                request_ids.append(request_id)
+                self._requests.put((self.client_id, request_id, text))
+
+            # Replies left over from an earlier call that failed or timed out
+            # are dropped, and every reply of this call is drained before an
+            # error is raised, so no call ever consumes another call's replies.
+            pending = set(request_ids)
+            embeddings = {}
+            first_error = None
+            while pending:
+                try:
+                    request_id, embedding, error = self._replies.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise RuntimeError(f"Embedding service did not answer within {self.timeout}s.")
+                if request_id not in pending:
+                    continue
+                pending.discard(request_id)
+                if error:
+                    first_error = first_error or error
+                else:
+                    embeddings[request_id] = embedding
+
+            if first_error:
+                raise RuntimeError(f"Embedding service failed to encode: {first_error}")
+
+        if single:
+            return embeddings[request_ids[0]]
+        import numpy as np
+        return np.stack([embeddings[request_id] for request_id in request_ids])
+
+
+class EmbeddingService:
+    """
+    A single process that owns the embedding model for every company worker.
+
+    Clients must be created with `create_client()` before `start()` is called,
+    since their reply queues are handed to the service process at launch.
+    """
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, max_batch_size: int = 64, max_wait_ms: int = 5, ctx=None):
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self._ctx = ctx or mp.get_context("spawn")
+        self._requests = self._ctx.Queue()
+        self._reply_queues = {}
+        self._process = None
+
+    def create_client(self, client_id: str) -> EmbeddingClient:
+        if self._process is not None:
+            raise RuntimeError("Cannot create embedding clients after the service has started.")
+        replies = self._ctx.Queue()
+        self._reply_queues[client_id] = replies
+        return EmbeddingClient(client_id, self._requests, replies)
+
+    def start(self):
+        self._process = self._ctx.Process(
+            target=_embedding_service_loop,
+            args=(self.model_name, self._requests, self._reply_queues, self.max_batch_size, self.max_wait_s),
+            name="embedding-service",
+            daemon=True,
+        )
+        self._process.start()
+
+    def stop(self, timeout: float = 10.0):
+        if self._process is None:
+            return
+        self._requests.put(None)
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+
+
+# --- Company Workers ---
+
+def _is_runnable(task, company: Company) -> bool:
+    """A task can run if it is pending, or blocked only on completed sub-tasks."""
+    if task.status == TaskStatus.PENDING:
+        return True
+    if task.status != TaskStatus.BLOCKED:
+        return False
+
+    dependencies = [company.tasks.get(dep_id) for dep_id in task.dependencies]
+    if any(dep is None or dep.status == TaskStatus.FAILED for dep in dependencies):
+        task.set_status(TaskStatus.FAILED, "A sub-task this task depends on failed or is missing.")
+        company.finish_task(task)
+        return False
+    return all(dep.status == TaskStatus.COMPLETED for dep in dependencies)
+
+
+def run_company_tasks(company: Company, max_rounds: int = 100):
+    """
+    Runs a company's tasks until none of them can make further progress.
+
+    Blocked tasks are picked up again once every sub-task they depend on has
+    completed, so delegation trees are worked through from the leaves up.
+    """
+    for _ in range(max_rounds):
+        runnable = [task for task in list(company.tasks.values()) if _is_runnable(task, company)]
+        if not runnable:
+            return
+        for task in runnable:
+            company.agents[task.assignee_id].process_task(task)
+
+
+def _summarize(company: Company) -> dict:
+    return {
+        "company": company.name,
+        "pid": os.getpid(),
+        "tasks": {task_id: task.status.value for task_id, task in company.tasks.items()},
+    }
+
+
+def _company_worker(manifests: list[dict], jobs: dict, embedding_client: EmbeddingClient, results):
+    """
+    Entry point of a worker process: loads its companies, resumes any tasks a
+    previous run left unfinished, and runs their jobs.
+    """
+    for manifest in manifests:
+        company_path = manifest.pop('_company_path')
+        company = Company(manifest, company_path, embedding_model=embedding_client)
+        if tracing_enabled():
+            # Companies run one after another, so each can own the tracer,
+            # and no two workers ever write to the same trace file.
+            set_tracer(tracer_from_env(per_company=True, company=re.sub(r"[^\w.-]+", "_", company.name)))
+        try:
+            company.load_agents()
+            company.resume_tasks()
+            for description, assignee_id in jobs.get(company.name, []):
+                company.create_task(description=description, assignee_id=assignee_id)
+            run_company_tasks(company)
+            results.put(_summarize(company))
+        except Exception as e:
+            results.put({"company": company.name, "pid": os.getpid(), "error": str(e)})
+        finally:
+            if tracing_enabled() and get_tracer() is not None:
+                get_tracer().close()
+
+
+class MultiCompanyRuntime:
+    """
+    Runs many companies at once, one worker process per group of companies.
+
+    All workers share one `EmbeddingService` process, so the transformer is
+    loaded once per machine instead of once per company.
+    """
+    def __init__(self, workspace_root: Path, max_workers: int | None = None, embedding_model: str = DEFAULT_EMBEDDING_MODEL):
+        self.workspace_root = workspace_root
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.embedding_model = embedding_model
+        self._ctx = mp.get_context("spawn")
+
+    def _group_manifests(self, manifests: list[dict]) -> list[list[dict]]:
+        worker_count = min(self.max_workers, len(manifests))
+        return [manifests[i::worker_count] for i in range(worker_count)]
+
+    def run(self, jobs: dict[str, list[tuple[str, str]]]) -> dict[str, dict]:
+        """
+        Runs the given jobs and waits for every company to finish.
+
+        Args:
+            jobs: Maps a company name to a list of (description, assignee_id)
+                  tasks to create in that company.
+
+        Returns:
+            A summary dictionary per company name.
+        """
+        manifests = discover_companies(self.workspace_root)
+        if not manifests:
+            print("No valid companies found in workspace.")
+            return {}
+
+        groups = self._group_manifests(manifests)
+        service = EmbeddingService(model_name=self.embedding_model, ctx=self._ctx)
+        results = self._ctx.Queue()
+        workers = []
+        for i, group in enumerate(groups):
+            client = service.create_client(f"worker-{i}")
+            workers.append(self._ctx.Process(
+                target=_company_worker,
+                args=(group, jobs, client, results),
+                name=f"company-worker-{i}",
+            ))
+
+        print(f"--- Starting {len(workers)} worker(s) for {len(manifests)} companies ---")
+        service.start()
+        for worker in workers:
+            worker.start()
+
+        summaries = {}
+        try:
+            while len(summaries) < len(manifests):
+                try:
+                    summary = results.get(timeout=1.0)
+                except queue.Empty:
+                    if not any(worker.is_alive() for worker in workers):
+                        print("WARNING: All workers exited before reporting every company.")
+                        break
+                    continue
+                summaries[summary["company"]] = summary
+        finally:
+            for worker in workers:
+                worker.join()
+            service.stop()
+
+        return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run tasks for every company in a workspace.")
+    parser.add_argument("--workspace", type=Path, default=Path(__file__).parent.parent / "workspace")
+    parser.add_argument("--workers", type=int, default=None, help="Maximum number of worker processes.")
+    parser.add_argument(
+        "--task", action="append", default=[], metavar="COMPANY:AGENT_ID:DESCRIPTION",
+        help="A task to run. May be given multiple times.",
+    )
+    args = parser.parse_args()
+
+    jobs: dict[str, list[tuple[str, str]]] = {}
+    for spec in args.task:
+        company_name, assignee_id, description = spec.split(":", 2)
+        jobs.setdefault(company_name, []).append((description, assignee_id))
+
+    runtime = MultiCompanyRuntime(args.workspace, max_workers=args.workers)
+    for company_name, summary in runtime.run(jobs).items():
+        print(f"{company_name}: {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@
 import uuid
 from enum import Enum
 from datetime import datetime
+from .events import event_bus
 
 class TaskStatus(Enum):
     PENDING = "PENDING"
@@ -13,10 +14,16 @@ class TaskStatus(Enum):
     BLOCKED = "BLOCKED" # A task is waiting on dependencies
 
 class Task:
-    def __init__(self, description: str, assignee_id: str, delegator_id: str = "OWNER", dependencies: list[str] = None):
+    def __init__(self, description: str, assignee_id: str, delegator_id: str = "OWNER", dependencies: list[str] = None,
+                 parent_id: str | None = None, depth: int = 0):
         self.task_id: str = str(uuid.uuid4())
         self.description: str = description
 
+        # Position in the delegation tree. Root tasks have no parent and depth 0.
+        self.parent_id: str | None = parent_id
+        self.depth: int = depth
+        self.subtask_ids: list[str] = []
+
         # State memory for the agent's iterative process
         self.iteration_count: int = 0
         self.previous_attempts: list = []
@@ -49,6 +56,42 @@ class Task:
     def __repr__(self) -> str:
         return f"<Task id='{self.task_id}' status='{self.status.value}' assignee='{self.assignee_id}'>"
 
+    def to_dict(self) -> dict:
+        """Serializes the task's durable state, e.g. for a checkpoint."""
+        return {
+            "task_id": self.task_id,
+            "description": self.description,
+            "assignee_id": self.assignee_id,
+            "delegator_id": self.delegator_id,
+            "parent_id": self.parent_id,
+            "depth": self.depth,
+            "subtask_ids": self.subtask_ids,
+            "dependencies": self.dependencies,
+            "status": self.status.value,
+            "iteration_count": self.iteration_count,
+            "previous_attempts": self.previous_attempts,
+            "history": self.history,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Task":
+        """Rebuilds a task from to_dict() output, keeping its original id."""
+        task = cls(
+            description=data["description"],
+            assignee_id=data["assignee_id"],
+            delegator_id=data.get("delegator_id", "OWNER"),
+            dependencies=list(data.get("dependencies", [])),
+            parent_id=data.get("parent_id"),
+            depth=data.get("depth", 0),
+        )
+        task.task_id = data["task_id"]
+        task.subtask_ids = list(data.get("subtask_ids", []))
+        task.status = TaskStatus(data.get("status", TaskStatus.PENDING.value))
+        task.iteration_count = data.get("iteration_count", 0)
+        task.previous_attempts = data.get("previous_attempts", [])
+        task.history = data.get("history", task.history)
+        return task
+
     def set_status(self, new_status: TaskStatus, notes: str = ""):
         """Updates the task's status and logs the change to its history."""
         self.status = new_status
@@ -57,4 +100,5 @@ class Task:
             "status": self.status.value,
             "notes": notes
         })
-        print(f"Task {self.task_id} status changed to: {self.status.value}")
\ No newline at end of file
+        print(f"Task {self.task_id} status changed to: {self.status.value}")
+        event_bus.publish("task.status", task_id=self.task_id, status=self.status.value, notes=notes, assignee_id=self.assignee_id)
\ No newline at end of file
@@ -0,0 +1,248 @@
+# core/trace.py
+
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+
+TRACE_VERSION = 1
+
+# Tools that change the company's task graph always run live during a replay,
+# so the scheduler sees the same tasks it saw while recording.
+LIVE_TOOLS = {"DELEGATE_TASK"}
+
+
+def _digest(value) -> str:
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()[:16]
+
+
+def _open(path: Path, mode: str):
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _complete_lines(f):
+    """Yields the complete lines of a trace, tolerating one cut short by a crash."""
+    try:
+        for line in f:
+            if line.endswith("\n"):
+                yield line
+    except EOFError:
+        return
+
+
+class Tracer:
+    """
+    Records every LLM call and tool call of a run to a trace file, or replays
+    one back without touching the network.
+
+    The trace is JSON Lines, gzip-compressed when the path ends in ".gz".
+    During replay, an LLM call is matched to a recorded one by the exact
+    prompt first. Prompts embed random task ids, so when there is no exact
+    match the next recorded call of the same agent and call type is used.
+    Tool calls are replayed in order per tool name, except LIVE_TOOLS.
+
+    Args:
+        path: The trace file.
+        mode: "record" or "replay".
+        replay_tools: When replaying, feed back recorded tool results instead
+                      of running the tools (skipping file writes and model
+                      encodes). Set to False to run tools live.
+    """
+    def __init__(self, path: Path, mode: str, replay_tools: bool = True):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown trace mode '{mode}'. Expected 'record' or 'replay'.")
+        self.path = Path(path)
+        self.mode = mode
+        self.replay_tools = replay_tools
+        self.divergences = 0
+        self._lock = threading.Lock()
+
+        if mode == "record":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = _open(self.path, "w")
+            self._write({"kind": "header", "version": TRACE_VERSION, "created_at": time.time()})
+            # Closing writes the gzip trailer; without it the trace still
+            # loads, but only up to the last flushed event.
+            atexit.register(self.close)
+        else:
+            self._file = None
+            self._llm_by_prompt: dict[str, deque] = defaultdict(deque)
+            self._llm_by_stream: dict[tuple, deque] = defaultdict(deque)
+            self._tools: dict[str, deque] = defaultdict(deque)
+            self._load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _write(self, event: dict):
+        with self._lock:
+            self._file.write(json.dumps(event, separators=(',', ':'), default=str) + "\n")
+            self._file.flush()
+
+    def _load(self):
+        with _open(self.path, "r") as f:
+            for line in _complete_lines(f):
+                event = json.loads(line)
+                if event["kind"] == "llm":
+                    # Both indexes share the event, so consuming it from one
+                    # marks it used for the other.
+                    event["used"] = False
+                    self._llm_by_prompt[event["prompt_digest"]].append(event)
+                    self._llm_by_stream[(event["agent_id"], event["call_type"])].append(event)
+                elif event["kind"] == "tool":
+                    self._tools[event["tool_name"]].append(event)
+        print(f"--- Loaded trace for replay: {self.path} ---")
+
+    # --- Recording ---
+
+    def record_llm(self, call_type: str, agent_id: str | None, prompt: str, response: str | None):
+        if self.recording:
+            self._write({
+                "kind": "llm",
+                "call_type": call_type,
+                "agent_id": agent_id,
+                "prompt_digest": _digest(prompt),
+                "response": response,
+            })
+
+    def record_tool(self, tool_name: str, payload: dict, result: dict | None):
+        if self.recording:
+            self._write({
+                "kind": "tool",
+                "tool_name": tool_name,
+                "payload_digest": _digest(payload),
+                "result": result,
+            })
+
+    # --- Replay ---
+
+    @staticmethod
+    def _pop_unused(events: deque) -> dict | None:
+        while events:
+            event = events.popleft()
+            if not event["used"]:
+                event["used"] = True
+                return event
+        return None
+
+    def replay_llm(self, call_type: str, agent_id: str | None, prompt: str) -> str | None:
+        """Returns the recorded response for this call, or None if the trace has none."""
+        with self._lock:
+            event = self._pop_unused(self._llm_by_prompt.get(_digest(prompt), deque()))
+            if event is None:
+                event = self._pop_unused(self._llm_by_stream.get((agent_id, call_type), deque()))
+                if event is not None:
+                    self.divergences += 1
+        if event is None:
+            print(f"  -> WARNING: Trace has no recorded '{call_type}' response for agent '{agent_id}'.")
+            return None
+        return event["response"]
+
+    def replay_tool(self, tool_name: str, payload: dict) -> dict | None:
+        """Returns the recorded result for this tool call, or None to run it live."""
+        if not self.replaying or not self.replay_tools or tool_name in LIVE_TOOLS:
+            return None
+        with self._lock:
+            events = self._tools.get(tool_name)
+            event = events.popleft() if events else None
+        if event is None:
+            print(f"  -> WARNING: Trace has no recorded result for '{tool_name}', running it live.")
+            return None
+        if event["payload_digest"] != _digest(payload):
+            self.divergences += 1
+        return event["result"]
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if self.replaying and self.divergences:
+            print(f"--- Replay diverged from the trace {self.divergences} time(s) ---")
+
+
+_active_tracer: Tracer | None = None
+_configured_from_env = False
+
+def set_tracer(tracer: Tracer | None):
+    """Installs the tracer used by the LLM API and the orchestrator (None disables tracing)."""
+    global _active_tracer, _configured_from_env
+    _active_tracer = tracer
+    _configured_from_env = True
+
+DEFAULT_TRACE_FILE = "trace.jsonl.gz"
+
+def tracing_enabled() -> bool:
+    return bool(os.getenv("TRACE_MODE"))
+
+def tracer_from_env(per_company: bool = False, **fields) -> Tracer | None:
+    """
+    Builds a tracer from the TRACE_MODE ("record" or "replay"), TRACE_FILE and
+    TRACE_REPLAY_TOOLS environment variables, or returns None when tracing is
+    off or the trace cannot be opened.
+
+    TRACE_FILE may contain "{pid}" and any placeholder passed in `fields`.
+    With `per_company`, the path always includes the "{company}" field (see
+    `per_company_template`).
+    """
+    mode = os.getenv("TRACE_MODE", "").lower()
+    if not mode:
+        return None
+    template = os.getenv("TRACE_FILE", DEFAULT_TRACE_FILE)
+    if per_company:
+        template = per_company_template(template)
+    try:
+        path = Path(template.format(pid=os.getpid(), **fields))
+    except (KeyError, IndexError) as e:
+        print(f"WARNING: TRACE_FILE placeholder {e} is not available here. Tracing is disabled.")
+        return None
+    replay_tools = os.getenv("TRACE_REPLAY_TOOLS", "True").lower() in ('true', '1', 't')
+    try:
+        return Tracer(path, mode, replay_tools=replay_tools)
+    except (OSError, ValueError) as e:
+        # A missing or unreadable trace must not fail the LLM call that
+        # happened to open it.
+        print(f"WARNING: Could not open trace '{path}': {e}. Tracing is disabled.")
+        return None
+
+def get_tracer() -> Tracer | None:
+    """
+    Returns the active tracer. Unless one was set explicitly, it is configured
+    from the environment on first use (see `tracer_from_env`).
+    """
+    global _active_tracer, _configured_from_env
+    if not _configured_from_env:
+        _configured_from_env = True
+        _active_tracer = tracer_from_env()
+    return _active_tracer
+
+def per_company_template(template: str) -> str:
+    """
+    Returns a TRACE_FILE template that names one file per company.
+
+    The multi-company runtime traces each company to its own file, so
+    workers never write to the same trace, and a company replays from its
+    file in any later run, whatever worker it lands on. A template without
+    a "{company}" placeholder gets one before its extensions, e.g.
+    "trace.jsonl.gz" becomes "trace.{company}.jsonl.gz".
+    """
+    if "{company}" in template:
+        return template
+    path = Path(template)
+    extensions = "".join(path.suffixes)
+    stem = path.name[:len(path.name) - len(extensions)] if extensions else path.name
+    return str(path.with_name(f"{stem}.{{company}}{extensions}"))
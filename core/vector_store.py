@@ -0,0 +1,357 @@
+# core/vector_store.py
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+STORAGE_DTYPES = ("float32", "float16", "int8")
+_SCAN_CHUNK_ROWS = 65536
+# records.jsonl is rewritten from the live entries once it holds more lines
+# than both this and twice the number of live entries.
+_MIN_LOG_RECORDS = 1000
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class FlatVectorStore:
+    """
+    A local, exact (brute-force) vector store over memory-mapped files.
+
+    Vectors are stored compactly: optionally truncated to their leading
+    dimensions (Matryoshka-style) and quantized to float16 or int8 with a
+    per-vector scale. Queries scan the compact vectors in chunks. When
+    `rerank_candidates` is set and the compact vectors lost precision, the
+    best candidates are then rescored against a float16 sidecar holding every
+    dimension, which is memory-mapped too, so only the candidate rows are
+    ever read. The sidecar costs 2 bytes per dimension per vector, so it only
+    pays off when it buys back recall lost to int8 or truncation.
+
+    It implements the subset of the ChromaDB collection API used by
+    MemoryManager (add, get, query, update, delete, count), and reports
+    distances as squared L2 over unit vectors, like the default collection.
+
+    Files in `store_dir`:
+        vectors.bin   compact vectors, one row per entry
+        scales.bin    float32 per-row scales (int8 only)
+        full.bin      float16 vectors with every dimension (when reranking)
+        records.jsonl append-only log of documents, metadata and deletions
+        store.json    layout of the files above
+
+    An add writes the vector files first and the log last, so an entry only
+    exists once its rows are complete. On open, the vector files are cut back
+    to the rows all of them hold, dropping whatever a crash left half-written.
+    """
+    def __init__(self, store_dir: Path, dtype: str = "float32", dims: int | None = None, rerank_candidates: int = 0):
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unsupported storage dtype '{dtype}'. Expected one of {STORAGE_DTYPES}.")
+        self.dir = store_dir
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._layout_path = self.dir / "store.json"
+        self._records_path = self.dir / "records.jsonl"
+
+        layout = {"dtype": dtype, "dims": dims, "rerank_candidates": rerank_candidates, "full_dims": None, "full_dtype": "float16"}
+        if self._layout_path.is_file():
+            # The files on disk decide the layout; changing the settings of an
+            # existing store requires compacting it into a fresh one
+            # (see MemoryManager.compact).
+            with open(self._layout_path, 'r', encoding='utf-8') as f:
+                stored_layout = json.load(f)
+            # Stores written before the float16 sidecar kept it in float32.
+            stored_layout.setdefault("full_dtype", "float32")
+            layout.update(stored_layout)
+        self.dtype = layout["dtype"]
+        self.dims = layout["dims"]
+        self.rerank_candidates = layout["rerank_candidates"]
+        self.full_dims = layout["full_dims"]
+        self.full_dtype = layout["full_dtype"]
+        self.rows = self._recover_rows()
+
+        self._ids: list[str | None] = [None] * self.rows
+        self._alive = bytearray(self.rows) # 1 for rows holding a live entry
+        self._row_of: dict[str, int] = {}
+        self._documents: dict[str, str] = {}
+        self._metadatas: dict[str, dict] = {}
+        self._mmaps: dict[str, np.memmap] = {}
+        self._log_records = 0
+        self._replay_records()
+
+    # --- Persistence ---
+
+    def _row_files(self) -> dict[str, int]:
+        """Maps each vector file in use to the size of one of its rows, in bytes."""
+        if self.full_dims is None:
+            return {}
+        files = {"vectors.bin": self._stored_dims * np.dtype(self.dtype).itemsize}
+        if self.dtype == "int8":
+            files["scales.bin"] = np.dtype(np.float32).itemsize
+        if self._reranks:
+            files["full.bin"] = self.full_dims * np.dtype(self.full_dtype).itemsize
+        return files
+
+    def _recover_rows(self) -> int:
+        """
+        Returns the number of rows every vector file holds in full, truncating
+        any file that holds more (an add interrupted before its log record).
+        """
+        files = self._row_files()
+        sizes = {name: (self.dir / name).stat().st_size if (self.dir / name).exists() else 0 for name in files}
+        rows = min((sizes[name] // row_bytes for name, row_bytes in files.items()), default=0)
+        for name, row_bytes in files.items():
+            if sizes[name] > rows * row_bytes:
+                with open(self.dir / name, 'r+b') as f:
+                    f.truncate(rows * row_bytes)
+        return rows
+
+    def _save_layout(self):
+        layout = {
+            "dtype": self.dtype,
+            "dims": self.dims,
+            "rerank_candidates": self.rerank_candidates,
+            "full_dims": self.full_dims,
+            "full_dtype": self.full_dtype,
+        }
+        tmp_path = self._layout_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(layout, f)
+        os.replace(tmp_path, self._layout_path)
+
+    def _replay_records(self):
+        if not self._records_path.is_file():
+            return
+        with open(self._records_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break # Append cut short by a crash
+                self._log_records += 1
+                record = json.loads(line)
+                doc_id = record["id"]
+                if record["op"] == "add":
+                    if record["row"] >= self.rows:
+                        continue # Vector write never completed; ignore the entry.
+                    if doc_id in self._row_of:
+                        self._drop(doc_id)
+                    self._ids[record["row"]] = doc_id
+                    self._alive[record["row"]] = 1
+                    self._row_of[doc_id] = record["row"]
+                    self._documents[doc_id] = record["document"]
+                    self._metadatas[doc_id] = record["metadata"]
+                elif record["op"] == "update" and doc_id in self._row_of:
+                    self._metadatas[doc_id] = record["metadata"]
+                elif record["op"] == "delete" and doc_id in self._row_of:
+                    self._drop(doc_id)
+
+    def _drop(self, doc_id: str):
+        row = self._row_of.pop(doc_id)
+        self._ids[row] = None
+        self._alive[row] = 0
+        self._documents.pop(doc_id, None)
+        self._metadatas.pop(doc_id, None)
+
+    def _append_records(self, records: list[dict]):
+        if not records:
+            return
+        with open(self._records_path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(',', ':')) + "\n")
+        self._log_records += len(records)
+        # Metadata updates pile up in the log; keep its replay proportional
+        # to the number of live entries.
+        if self._log_records > max(_MIN_LOG_RECORDS, 2 * self.count()):
+            self._compact_records()
+
+    def _compact_records(self):
+        """Rewrites the log atomically as one add record per live entry."""
+        tmp_path = self._records_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for row, doc_id in enumerate(self._ids):
+                if doc_id is not None:
+                    record = {"op": "add", "id": doc_id, "row": row, "document": self._documents[doc_id], "metadata": self._metadatas[doc_id]}
+                    f.write(json.dumps(record, separators=(',', ':')) + "\n")
+        os.replace(tmp_path, self._records_path)
+        self._log_records = self.count()
+
+    def _mmap(self, name: str, dtype: str, width: int | None) -> np.memmap | None:
+        """Returns a read-only memory map of one of the vector files."""
+        if self.rows == 0:
+            return None
+        if name not in self._mmaps:
+            shape = (self.rows, width) if width else (self.rows,)
+            self._mmaps[name] = np.memmap(self.dir / name, dtype=dtype, mode='r', shape=shape)
+        return self._mmaps[name]
+
+    @property
+    def _stored_dims(self) -> int | None:
+        if self.full_dims is None:
+            return self.dims
+        return min(self.dims or self.full_dims, self.full_dims)
+
+    @property
+    def _reranks(self) -> bool:
+        """
+        True if queries rerank against the full.bin sidecar. Untruncated
+        float32 vectors are already full precision and need none.
+        """
+        if not self.rerank_candidates or self.full_dims is None:
+            return False
+        return self.dtype != "float32" or self._stored_dims < self.full_dims
+
+    # --- Encoding ---
+
+    def _compact_vectors(self, full: np.ndarray) -> tuple[np.ndarray, np.ndarray | None]:
+        """Truncates, renormalizes and quantizes unit vectors for storage."""
+        vectors = _normalize(full[:, :self._stored_dims])
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1.0
+            codes = np.round(vectors / scales[:, None]).astype(np.int8)
+            return codes, scales.astype(np.float32)
+        return vectors.astype(self.dtype), None
+
+    def _query_vector(self, embedding) -> tuple[np.ndarray, np.ndarray]:
+        full = _normalize(np.asarray(embedding, dtype=np.float32))
+        return full, _normalize(full[:self._stored_dims])
+
+    # --- Collection API ---
+
+    def count(self) -> int:
+        return len(self._row_of)
+
+    def add(self, ids: list[str], embeddings: list, documents: list[str], metadatas: list[dict]):
+        full = _normalize(np.asarray(embeddings, dtype=np.float32))
+        if self.full_dims is None:
+            # The layout must be on disk before any row, or the rows could
+            # not be measured when the store is reopened.
+            self.full_dims = full.shape[1]
+            self._save_layout()
+        codes, scales = self._compact_vectors(full)
+
+        # Vectors first, then the log: a crash in between leaves complete rows
+        # that no record points to, which stay dead until MemoryManager.compact
+        # drops them, or partial rows, which are truncated on the next open.
+        with open(self.dir / "vectors.bin", 'ab') as f:
+            f.write(codes.tobytes())
+        if scales is not None:
+            with open(self.dir / "scales.bin", 'ab') as f:
+                f.write(scales.tobytes())
+        if self._reranks:
+            with open(self.dir / "full.bin", 'ab') as f:
+                f.write(full.astype(self.full_dtype).tobytes())
+
+        records = []
+        for offset, doc_id in enumerate(ids):
+            row = self.rows + offset
+            records.append({"op": "add", "id": doc_id, "row": row, "document": documents[offset], "metadata": metadatas[offset]})
+            if doc_id in self._row_of:
+                self._drop(doc_id)
+            self._ids.append(doc_id)
+            self._alive.append(1)
+            self._row_of[doc_id] = row
+            self._documents[doc_id] = documents[offset]
+            self._metadatas[doc_id] = metadatas[offset]
+        self.rows += len(ids)
+        self._mmaps.clear()
+        self._append_records(records)
+
+    def update(self, ids: list[str], metadatas: list[dict]):
+        records = []
+        for doc_id, metadata in zip(ids, metadatas):
+            if doc_id in self._row_of:
+                self._metadatas[doc_id] = metadata
+                records.append({"op": "update", "id": doc_id, "metadata": metadata})
+        self._append_records(records)
+
+    def delete(self, ids: list[str]):
+        records = []
+        for doc_id in ids:
+            if doc_id in self._row_of:
+                self._drop(doc_id)
+                records.append({"op": "delete", "id": doc_id})
+        self._append_records(records)
+
+    def _embeddings_for(self, rows: list[int]) -> list[list[float]]:
+        full = self._mmap("full.bin", self.full_dtype, self.full_dims) if self._reranks else None
+        if full is not None:
+            return np.asarray(full[rows], dtype=np.float32).tolist()
+        # Without a sidecar, the best available vectors are the compact ones.
+        vectors = np.asarray(self._mmap("vectors.bin", self.dtype, self._stored_dims)[rows], dtype=np.float32)
+        if self.dtype == "int8":
+            vectors *= self._mmap("scales.bin", "float32", None)[rows][:, None]
+        return vectors.tolist()
+
+    def get(self, ids: list[str] = None, include: list[str] = None) -> dict:
+        include = include if include is not None else ["documents", "metadatas"]
+        if ids is None:
+            ids = [doc_id for doc_id in self._ids if doc_id is not None]
+        else:
+            ids = [doc_id for doc_id in ids if doc_id in self._row_of]
+
+        result = {"ids": ids}
+        if "documents" in include:
+            result["documents"] = [self._documents[doc_id] for doc_id in ids]
+        if "metadatas" in include:
+            result["metadatas"] = [self._metadatas[doc_id] for doc_id in ids]
+        if "embeddings" in include:
+            result["embeddings"] = self._embeddings_for([self._row_of[doc_id] for doc_id in ids]) if ids else []
+        return result
+
+    def _scan(self, query: np.ndarray, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Scores every live row against the query, chunk by chunk, keeping the top_k."""
+        vectors = self._mmap("vectors.bin", self.dtype, self._stored_dims)
+        scales = self._mmap("scales.bin", "float32", None) if self.dtype == "int8" else None
+        alive = np.frombuffer(bytes(self._alive), dtype=bool)
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, self.rows, _SCAN_CHUNK_ROWS):
+            stop = min(start + _SCAN_CHUNK_ROWS, self.rows)
+            scores = np.asarray(vectors[start:stop], dtype=np.float32) @ query
+            if scales is not None:
+                scores *= scales[start:stop]
+            scores[~alive[start:stop]] = -np.inf
+
+            rows = np.concatenate([best_rows, np.arange(start, stop)])
+            scores = np.concatenate([best_scores, scores])
+            if len(scores) > top_k:
+                keep = np.argpartition(-scores, top_k)[:top_k]
+                rows, scores = rows[keep], scores[keep]
+            best_rows, best_scores = rows, scores
+
+        live = np.isfinite(best_scores)
+        return best_rows[live], best_scores[live]
+
+    def query(self, query_embeddings: list, n_results: int = 10, include: list[str] = None) -> dict:
+        include = include if include is not None else ["documents", "metadatas", "distances"]
+        result = {"ids": []}
+        for key in ("documents", "metadatas", "distances"):
+            if key in include:
+                result[key] = []
+
+        for embedding in query_embeddings:
+            rows, scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            if self.count():
+                full_query, compact_query = self._query_vector(embedding)
+                if self._reranks:
+                    rows, scores = self._scan(compact_query, max(n_results, self.rerank_candidates))
+                    # Rerank: rescore the shortlist with every dimension.
+                    full = self._mmap("full.bin", self.full_dtype, self.full_dims)
+                    order = np.argsort(rows) # Sequential reads from the memory map
+                    rows = rows[order]
+                    scores = np.asarray(full[rows], dtype=np.float32) @ full_query
+                else:
+                    rows, scores = self._scan(compact_query, n_results)
+            top = np.argsort(-scores)[:n_results]
+            ids = [self._ids[row] for row in rows[top]]
+
+            result["ids"].append(ids)
+            if "documents" in result:
+                result["documents"].append([self._documents[doc_id] for doc_id in ids])
+            if "metadatas" in result:
+                result["metadatas"].append([self._metadatas[doc_id] for doc_id in ids])
+            if "distances" in result:
+                result["distances"].append((2 - 2 * scores[top]).tolist())
+        return result
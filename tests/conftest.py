@@ -0,0 +1,21 @@
+import json
+
+import pytest
+
+from core.company import Company
+
+
+@pytest.fixture
+def make_company(tmp_path):
+    """Builds a company with a CTO and a DBA agent in a temporary workspace."""
+    def make(governance: dict = None) -> Company:
+        root = tmp_path / "acme"
+        for agent_id, role in (("cto", "Chief Technology Officer"), ("dba", "Database Architect")):
+            agent_dir = root / agent_id
+            agent_dir.mkdir(parents=True, exist_ok=True)
+            (agent_dir / ".agent_meta.json").write_text(json.dumps({"agent_id": agent_id, "role": role}))
+        manifest = {"identity": {"name": "Acme"}, "governance": governance or {}, "memory_storage": {"backend": "flat"}}
+        company = Company(manifest, root)
+        company.load_agents()
+        return company
+    return make
@@ -0,0 +1,140 @@
+import json
+
+import pytest
+
+from core import agent as agent_module
+from core.checkpoint import CheckpointStore
+from core.runtime import run_company_tasks
+from core.task import Task, TaskStatus
+
+PLAN = {"reasoning": "Write the schema.", "actions": [{"tool_name": "WRITE_FILE", "payload": {"path": "schema.sql", "content": "CREATE TABLE t;"}}]}
+RESULTS = [{"status": "success", "message": "Content written to 'schema.sql'."}]
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    """Answers every LLM call with a valid plan or a 'complete' reflection, recording call types."""
+    calls = []
+    def respond(prompt, call_type="default", **kwargs):
+        calls.append(call_type)
+        if call_type == "reflect":
+            return json.dumps({"critique": "Done.", "is_complete": True})
+        return json.dumps(PLAN)
+    monkeypatch.setattr(agent_module, "generate_structured_response", respond)
+    return calls
+
+
+@pytest.fixture
+def executed(monkeypatch):
+    runs = []
+    def execute(actions, company, task):
+        runs.append(actions)
+        return RESULTS
+    monkeypatch.setattr(agent_module, "execute_actions", execute)
+    return runs
+
+
+def test_task_round_trips_through_dict():
+    task = Task("Design it.", "dba", delegator_id="cto", dependencies=["x"], parent_id="p", depth=2)
+    task.subtask_ids.append("s")
+    task.iteration_count = 2
+    task.previous_attempts.append({"plan": PLAN})
+    task.set_status(TaskStatus.BLOCKED, "Waiting.")
+
+    restored = Task.from_dict(json.loads(json.dumps(task.to_dict())))
+    assert restored.to_dict() == task.to_dict()
+    assert restored.status == TaskStatus.BLOCKED
+
+
+def test_store_saves_loads_and_deletes(tmp_path):
+    store = CheckpointStore(tmp_path / "checkpoints")
+    task = Task("Design it.", "dba")
+    store.save(task, "plan", plan=PLAN)
+
+    checkpoint = store.load(task.task_id)
+    assert checkpoint["phase"] == "plan"
+    assert checkpoint["plan"] == PLAN
+    assert checkpoint["task"]["task_id"] == task.task_id
+    assert [c["task"]["task_id"] for c in store.load_all()] == [task.task_id]
+
+    store.delete(task.task_id)
+    assert store.load(task.task_id) is None
+    assert store.load_all() == []
+
+
+def test_unreadable_checkpoint_is_skipped(tmp_path):
+    store = CheckpointStore(tmp_path)
+    (tmp_path / "broken.json").write_text('{"phase": "pl')
+    assert store.load_all() == []
+
+
+def interrupted_company(make_company, phase: str, **state):
+    """Returns a restarted company whose only task stopped after `phase` of iteration 1."""
+    company = make_company()
+    task = company.create_task("Design the schema.", "dba")
+    task.iteration_count = 1
+    task.set_status(TaskStatus.IN_PROGRESS, "Working.")
+    company.checkpoints.save(task, phase, **state)
+
+    restarted = make_company()
+    resumed = restarted.resume_tasks()
+    assert [t.task_id for t in resumed] == [task.task_id]
+    assert resumed[0].status == TaskStatus.PENDING
+    return restarted, resumed[0]
+
+
+def test_resume_after_plan_skips_planning(make_company, llm_calls, executed):
+    company, task = interrupted_company(make_company, "plan", plan=PLAN)
+    run_company_tasks(company)
+
+    assert llm_calls == ["reflect"]
+    assert executed == [PLAN["actions"]]
+    assert task.status == TaskStatus.COMPLETED
+    assert task.iteration_count == 1
+
+
+def test_resume_after_execute_skips_tools(make_company, llm_calls, executed):
+    company, task = interrupted_company(make_company, "execute", plan=PLAN, execution_results=RESULTS)
+    run_company_tasks(company)
+
+    assert llm_calls == ["reflect"]
+    assert executed == []
+    assert task.status == TaskStatus.COMPLETED
+
+
+def test_resume_after_reflect_starts_next_iteration(make_company, llm_calls, executed):
+    company, task = interrupted_company(make_company, "reflect")
+    run_company_tasks(company)
+
+    assert llm_calls == ["plan", "reflect"]
+    assert task.iteration_count == 2
+
+
+def test_finished_root_removes_its_tree_checkpoints(make_company, llm_calls, executed):
+    company = make_company()
+    root = company.create_task("Design the platform.", "cto")
+    subtask = company.create_task("Design the schema.", "dba", delegator_id="cto", parent_task=root)
+
+    company.agents["dba"].process_task(subtask)
+    assert company.checkpoints.load(subtask.task_id)["phase"] == "completed"
+
+    company.agents["cto"].process_task(root)
+    assert company.checkpoints.load_all() == []
+
+
+def test_task_failed_by_its_dependency_is_finished(make_company):
+    company = make_company()
+    root = company.create_task("Design the platform.", "cto")
+    subtask = company.create_task("Design the schema.", "dba", delegator_id="cto", parent_task=root)
+    root.dependencies.append(subtask.task_id)
+    root.set_status(TaskStatus.BLOCKED, "Waiting.")
+    company.checkpoints.save(root, "blocked")
+    subtask.set_status(TaskStatus.FAILED, "Could not do it.")
+    company.finish_task(subtask)
+
+    restarted = make_company()
+    restarted.resume_tasks()
+    run_company_tasks(restarted)
+
+    assert restarted.tasks[root.task_id].status == TaskStatus.FAILED
+    assert restarted.checkpoints.load_all() == []
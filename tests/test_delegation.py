@@ -0,0 +1,77 @@
+import pytest
+
+from core.orchestrator import delegate_task
+from core.task import TaskStatus
+
+
+def test_equivalent_delegation_is_reused(make_company):
+    company = make_company()
+    root = company.create_task("Design the platform.", "cto")
+    payload = {"assignee_id": "dba", "description": "Design the  database schema."}
+
+    first = delegate_task(company, root, payload)
+    second = delegate_task(company, root, {**payload, "description": "design the database schema"})
+
+    assert first["status"] == second["status"] == "success"
+    assert "already delegated" in second["message"]
+    assert len(root.subtask_ids) == 1
+    assert len(company.tasks) == 2
+
+
+def test_reused_delegation_can_block_the_caller(make_company):
+    company = make_company()
+    root = company.create_task("Design the platform.", "cto")
+    delegate_task(company, root, {"assignee_id": "dba", "description": "Design the schema"})
+    delegate_task(company, root, {"assignee_id": "dba", "description": "Design the schema", "block_self": True})
+
+    assert root.status == TaskStatus.BLOCKED
+    assert root.dependencies == root.subtask_ids
+
+
+def test_same_description_under_another_parent_is_not_reused(make_company):
+    company = make_company()
+    first_root = company.create_task("Project one.", "cto")
+    second_root = company.create_task("Project two.", "cto")
+    delegate_task(company, first_root, {"assignee_id": "dba", "description": "Design the schema"})
+
+    assert company.find_equivalent_task("Design the schema", "dba", second_root.task_id) is None
+
+
+def test_failed_delegation_can_be_retried(make_company):
+    company = make_company()
+    root = company.create_task("Design the platform.", "cto")
+    subtask = company.create_task("Design the schema", "dba", delegator_id="cto", parent_task=root)
+    subtask.set_status(TaskStatus.FAILED, "Could not do it.")
+
+    assert company.find_equivalent_task("Design the schema", "dba", root.task_id) is None
+    delegate_task(company, root, {"assignee_id": "dba", "description": "Design the schema"})
+    assert len(root.subtask_ids) == 2
+
+
+def test_fan_out_limit(make_company):
+    company = make_company({"max_subtasks_per_task": 2})
+    root = company.create_task("Design the platform.", "cto")
+    for i in range(2):
+        company.create_task(f"Part {i}", "dba", delegator_id="cto", parent_task=root)
+
+    with pytest.raises(ValueError, match="maximum of 2 sub-tasks"):
+        company.create_task("Part 3", "dba", delegator_id="cto", parent_task=root)
+    result = delegate_task(company, root, {"assignee_id": "dba", "description": "Part 4"})
+    assert result["status"] == "error"
+
+
+def test_depth_limit(make_company):
+    company = make_company({"max_task_depth": 2})
+    task = company.create_task("Level 0", "cto")
+    for level in (1, 2):
+        task = company.create_task(f"Level {level}", "dba", delegator_id="cto", parent_task=task)
+    assert task.depth == 2
+
+    with pytest.raises(ValueError, match="maximum task depth of 2"):
+        company.create_task("Level 3", "dba", delegator_id="dba", parent_task=task)
+
+
+def test_unknown_assignee(make_company):
+    company = make_company()
+    with pytest.raises(ValueError, match="not found"):
+        company.create_task("Anything", "nobody")
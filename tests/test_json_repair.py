@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from core.json_repair import extract_json_object, parse_llm_json, repair_json
+
+
+# --- extract_json_object ---
+
+def test_extract_skips_surrounding_prose():
+    text = 'Here is my plan:\n{"reasoning": "ok", "actions": []}\nLet me know!'
+    assert extract_json_object(text) == '{"reasoning": "ok", "actions": []}'
+
+
+def test_extract_ignores_braces_inside_strings():
+    text = '{"content": "def f(): return {}}"} trailing'
+    assert extract_json_object(text) == '{"content": "def f(): return {}}"}'
+
+
+def test_extract_ignores_braces_inside_typographic_strings():
+    assert extract_json_object("{“a”: “}{”} tail") == "{“a”: “}{”}"
+
+
+def test_extract_returns_unclosed_object():
+    assert extract_json_object('noise {"a": [1, 2') == '{"a": [1, 2'
+
+
+def test_extract_without_object():
+    assert extract_json_object("no json here") is None
+
+
+# --- repair_json ---
+
+@pytest.mark.parametrize("broken, expected", [
+    ('{"a": 1,}', {"a": 1}),
+    ('{"a": [1, 2,],}', {"a": [1, 2]}),
+    ('{"ok": True, "value": None, "no": False}', {"ok": True, "value": None, "no": False}),
+    ('{"text": "line one\nline two\ttabbed"}', {"text": "line one\nline two\ttabbed"}),
+    ('{"a": {"b": [1, 2', {"a": {"b": [1, 2]}}),
+    ("{“reasoning”: “ok”}", {"reasoning": "ok"}),
+])
+def test_repair_fixes_common_mistakes(broken, expected):
+    assert json.loads(repair_json(broken)) == expected
+
+
+def test_repair_keeps_typographic_quotes_inside_strings():
+    assert json.loads(repair_json('{"content": "He said “hi”",}')) == {"content": "He said “hi”"}
+    assert json.loads(repair_json('{"content": "It’s done",}')) == {"content": "It’s done"}
+
+
+def test_repair_escapes_plain_quotes_in_typographic_strings():
+    assert json.loads(repair_json('{“content”: “say "x" now”}')) == {"content": 'say "x" now'}
+
+
+def test_repair_leaves_literal_words_inside_strings():
+    assert json.loads(repair_json('{"text": "True or None",}')) == {"text": "True or None"}
+
+
+def test_repair_does_not_close_truncated_string():
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(repair_json('{"content": "the response was cut'))
+
+
+# --- parse_llm_json ---
+
+def test_parse_valid_json_unchanged():
+    assert parse_llm_json('{"critique": "fine", "is_complete": true}') == {"critique": "fine", "is_complete": True}
+
+
+def test_parse_strips_markdown_fences():
+    raw = '```json\n{"reasoning": "r", "actions": []}\n```'
+    assert parse_llm_json(raw) == {"reasoning": "r", "actions": []}
+
+
+def test_parse_repairs_payload_with_typographic_quotes():
+    raw = 'Plan:\n{"actions": [{"tool_name": "WRITE_FILE", "payload": {"content": "“Quoted” and it’s fine",}},]}'
+    payload = parse_llm_json(raw)["actions"][0]["payload"]
+    assert payload == {"content": "“Quoted” and it’s fine"}
+
+
+@pytest.mark.parametrize("raw", ["no json at all", "[1, 2, 3]", '{"content": "cut off'])
+def test_parse_raises_value_error(raw):
+    with pytest.raises(ValueError):
+        parse_llm_json(raw)
@@ -0,0 +1,72 @@
+from core.lexical_index import LexicalIndex, is_identifier_query, tokenize
+
+
+def test_tokenize_keeps_identifiers_whole_and_split():
+    assert tokenize("See agent_id_dba_001.") == ["see", "agent_id_dba_001", "agent", "id", "dba", "001"]
+    assert "docs/api_spec.md" in tokenize("Read docs/api_spec.md first")
+
+
+def test_is_identifier_query():
+    assert is_identifier_query("agent_id_dba_001")
+    assert is_identifier_query("users.sql")
+    assert not is_identifier_query("the users table")
+    assert not is_identifier_query("schema")
+
+
+def test_bm25_ranks_exact_identifier_first(tmp_path):
+    index = LexicalIndex(tmp_path / "index.json")
+    index.add("cto", "agent_id_cto_001 approved the schema")
+    index.add("dba", "agent_id_dba_001 designed the users table")
+    index.add("prose", "The DBA designed the users table")
+
+    assert index.search("agent_id_dba_001")[0][0] == "dba"
+    assert index.has_token("agent_id_dba_001")
+    assert not index.has_token("agent_id_programmer_001")
+
+
+def test_rare_terms_outweigh_common_ones(tmp_path):
+    index = LexicalIndex(tmp_path / "index.json")
+    for i in range(5):
+        index.add(f"common{i}", "the table")
+    index.add("rare", "the migrations table")
+    assert index.search("migrations table", 1)[0][0] == "rare"
+
+
+def test_log_replay_restores_index(tmp_path):
+    path = tmp_path / "index.json"
+    index = LexicalIndex(path)
+    index.add("a", "alpha beta")
+    index.add("b", "beta gamma")
+    index.add("a", "alpha delta") # Indexed again with different text
+    index.remove(["b"])
+
+    assert not path.exists() # Nothing compacted yet, only the log
+    reopened = LexicalIndex(path)
+    assert len(reopened) == 1
+    assert reopened.postings == index.postings
+    assert reopened.total_length == index.total_length
+    assert reopened.search("delta")[0][0] == "a"
+    assert reopened.search("beta") == []
+
+
+def test_compact_folds_log_into_snapshot(tmp_path):
+    path = tmp_path / "index.json"
+    index = LexicalIndex(path)
+    index.add("a", "alpha beta")
+    index.compact()
+    index.add("b", "gamma")
+
+    assert path.exists()
+    reopened = LexicalIndex(path)
+    assert sorted(reopened.doc_lengths) == ["a", "b"]
+
+
+def test_torn_log_line_is_ignored(tmp_path):
+    path = tmp_path / "index.json"
+    index = LexicalIndex(path)
+    index.add("a", "alpha")
+    with open(index.log_path, "a", encoding="utf-8") as f:
+        f.write('{"op":"add","id":"b","te')
+
+    reopened = LexicalIndex(path)
+    assert list(reopened.doc_lengths) == ["a"]
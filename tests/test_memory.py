@@ -0,0 +1,70 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from core.memory import MemoryManager
+
+
+class HashingEncoder:
+    """Deterministic bag-of-words embeddings, so tests need no model."""
+    def encode(self, text):
+        vector = np.zeros(64, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1
+        return vector / (np.linalg.norm(vector) or 1)
+
+
+@pytest.fixture
+def memory(tmp_path):
+    return MemoryManager(
+        tmp_path,
+        embedding_model=HashingEncoder(),
+        memory_policy={"near_duplicate_threshold": 0.8},
+        memory_storage={"backend": "flat"},
+    )
+
+
+def test_exact_repeat_is_a_duplicate(memory):
+    assert memory.memorize("The API uses JWT tokens.")["outcome"] == "added"
+    stored = memory.memorize("the api  uses JWT tokens.")
+    assert stored == {"outcome": "duplicate", "document": "The API uses JWT tokens."}
+    assert memory.collection.count() == 1
+
+
+def test_near_duplicate_replaces_older_text(memory):
+    memory.memorize("the users table has 12 columns in total now")
+    stored = memory.memorize("the users table has 14 columns in total now")
+
+    assert stored["outcome"] == "replaced"
+    assert stored["previous"] == "the users table has 12 columns in total now"
+    assert memory.collection.count() == 1
+    assert len(memory.lexical_index) == 1
+    recalled = memory.recall("users table columns")
+    assert [r["document"] for r in recalled] == ["the users table has 14 columns in total now"]
+    assert recalled[0]["metadata"]["times_seen"] == 2
+
+
+def test_unrelated_memories_are_both_kept(memory):
+    memory.memorize("the users table has 12 columns")
+    memory.memorize("deployment runs every friday afternoon")
+    assert memory.collection.count() == 2
+
+
+def test_identifier_fast_path_needs_whole_identifier(memory):
+    memory.memorize("agent_id_cto_001 approved the schema")
+    memory.memorize("The DBA designed the users table")
+    memory.memorize("agent_id_dba_001 owns the migrations")
+
+    assert memory.recall("agent_id_dba_001", 1)[0]["document"] == "agent_id_dba_001 owns the migrations"
+
+
+def test_identifier_parts_alone_fall_back_to_fusion(memory, monkeypatch):
+    memory.memorize("agent_id_cto_001 approved the schema")
+    memory.memorize("The DBA designed the users table")
+    searched = []
+    original = memory._vector_search
+    monkeypatch.setattr(memory, "_vector_search", lambda query, n: searched.append(query) or original(query, n))
+
+    memory.recall("agent_id_dba_001")
+    assert searched == ["agent_id_dba_001"]
@@ -0,0 +1,98 @@
+import pytest
+
+from core import llm_api
+from core.llm_api import MODEL_TIERS, ModelRouter
+
+
+@pytest.mark.parametrize("mode, call_type, tier", [
+    ("ECONOMY", "plan", "balanced"),
+    ("ECONOMY", "reflect", "fast"),
+    ("BALANCED", "plan", "strong"),
+    ("BALANCED", "reflect", "fast"),
+    ("BALANCED", "something_else", "balanced"),
+    ("QUALITY", "repair", "balanced"),
+    ("QUALITY", "default", "strong"),
+])
+def test_operational_mode_picks_tier_per_call_type(mode, call_type, tier):
+    assert ModelRouter(mode).select_tier(call_type) == tier
+
+
+def test_unknown_mode_falls_back_to_balanced():
+    assert ModelRouter("TURBO").call_types == ModelRouter("BALANCED").call_types
+
+
+def test_critical_agents_plan_with_strong_tier():
+    router = ModelRouter("ECONOMY", critical_agents=["cto"])
+    assert router.select_tier("plan", "cto") == "strong"
+    assert router.select_tier("reflect", "cto") == "fast"
+    assert router.select_tier("plan", "dba") == "balanced"
+
+
+def test_agent_override_wins():
+    router = ModelRouter("BALANCED", routing={"agents": {"cto": {"reflect": "strong"}}}, critical_agents=["cto"])
+    assert router.select_tier("reflect", "cto") == "strong"
+
+
+def test_long_prompts_escalate_one_tier():
+    router = ModelRouter("BALANCED", routing={"escalate_above_chars": 100})
+    assert router.select_tier("reflect", prompt_chars=100) == "fast"
+    assert router.select_tier("reflect", prompt_chars=101) == "balanced"
+    assert router.select_tier("plan", prompt_chars=101) == "strong"
+
+
+def test_from_manifest():
+    router = ModelRouter.from_manifest({
+        "operational_mode": "economy",
+        "model_routing": {"tiers": {"fast": "tiny-model"}, "call_types": {"plan": "fast"}},
+        "governance": {"critical_decision_makers": ["cto"]},
+    })
+    assert router.candidate_models("plan")[0] == "tiny-model"
+    assert router.select_tier("plan", "cto") == "strong"
+
+
+@pytest.mark.parametrize("call_type, expected_tiers", [
+    ("reflect", ["fast", "balanced", "strong"]),
+    ("default", ["balanced", "fast", "strong"]),
+    ("plan", ["strong", "balanced", "fast"]),
+])
+def test_fallback_order_is_nearest_tier_first_cheaper_first(call_type, expected_tiers):
+    router = ModelRouter("BALANCED")
+    assert router.candidate_models(call_type) == [MODEL_TIERS[tier] for tier in expected_tiers]
+
+
+def test_candidates_are_deduplicated():
+    router = ModelRouter("BALANCED", routing={"tiers": {"fast": "same", "balanced": "same"}})
+    assert router.candidate_models("reflect") == ["same", MODEL_TIERS["strong"]]
+
+
+class FakeModel:
+    def __init__(self, name, calls, error=None):
+        self.name, self.calls, self.error = name, calls, error
+
+    def generate_content(self, prompt):
+        self.calls.append(self.name)
+        if self.error:
+            raise RuntimeError(self.error)
+        return type("Response", (), {"text": f"answer from {self.name}"})()
+
+
+def test_overloaded_model_falls_back_to_next_candidate(monkeypatch):
+    calls = []
+    errors = {MODEL_TIERS["fast"]: "429 Resource exhausted"}
+    monkeypatch.setattr(llm_api, "is_mock_mode", lambda: False)
+    monkeypatch.setattr(llm_api, "_get_genai", lambda: None)
+    monkeypatch.setattr(llm_api, "_get_model", lambda name: FakeModel(name, calls, errors.get(name)))
+
+    response = llm_api._generate("prompt", "reflect", None, ModelRouter("BALANCED"))
+    assert calls == [MODEL_TIERS["fast"], MODEL_TIERS["balanced"]]
+    assert response == f"answer from {MODEL_TIERS['balanced']}"
+
+
+def test_other_errors_do_not_fall_back(monkeypatch):
+    calls = []
+    monkeypatch.setattr(llm_api, "is_mock_mode", lambda: False)
+    monkeypatch.setattr(llm_api, "_get_genai", lambda: None)
+    monkeypatch.setattr(llm_api, "_get_model", lambda name: FakeModel(name, calls, "400 invalid argument"))
+
+    assert llm_api._generate("prompt", "reflect", None, ModelRouter("BALANCED")) is None
+    assert calls == [MODEL_TIERS["fast"]]
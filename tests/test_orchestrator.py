@@ -0,0 +1,52 @@
+import threading
+import time
+
+import pytest
+
+from core.orchestrator import TOOL_REGISTRY, ToolSpec, dispatch_tool, register_tool, validate_actions
+
+
+class FakeCompany:
+    fs = "fs"
+    memory = "memory"
+
+
+def thread_name_tool(*args):
+    return {"status": "success", "thread": threading.current_thread().name, "args": list(args[:-1])}
+
+
+@pytest.mark.parametrize("executor, prefix", [("inline", "MainThread"), ("io", "tool-io"), ("cpu", "tool-cpu")])
+def test_dispatch_runs_tool_on_its_executor(executor, prefix):
+    spec = ToolSpec("PROBE", thread_name_tool, ("memory",), executor, 5, "", ())
+    result = dispatch_tool(spec, {}, FakeCompany(), None)
+    assert result["thread"].startswith(prefix)
+    assert result["args"] == ["memory"]
+
+
+def test_memory_tools_do_not_share_the_file_io_pool():
+    assert TOOL_REGISTRY["MEMORIZE_THIS"].executor == "cpu"
+    assert TOOL_REGISTRY["RECALL_CONTEXT"].executor == "cpu"
+    assert TOOL_REGISTRY["WRITE_FILE"].executor == "io"
+    assert TOOL_REGISTRY["DELEGATE_TASK"].executor == "inline"
+
+
+def test_timeout_is_reported_as_error():
+    spec = ToolSpec("SLOW", lambda payload: time.sleep(0.5), (), "io", 0.05, "", ())
+    result = dispatch_tool(spec, {}, FakeCompany(), None)
+    assert result == {"status": "error", "message": "Tool 'SLOW' timed out after 0.05s."}
+
+
+@pytest.mark.parametrize("kwargs, message", [
+    ({"requires": ("network",)}, "unknown dependencies"),
+    ({"executor": "gpu"}, "unknown executor"),
+])
+def test_register_tool_rejects_bad_specs(kwargs, message):
+    with pytest.raises(ValueError, match=message):
+        register_tool("BAD", **kwargs)
+
+
+def test_validate_actions():
+    assert validate_actions([{"tool_name": "READ_FILE", "payload": {"filepath": "a.md"}}]) == []
+    errors = validate_actions([{"tool_name": "WRITE_FILE", "payload": {"path": "a.md"}}, {"tool_name": "NOPE"}])
+    assert "payload is missing 'content'" in errors[0]
+    assert "unknown tool 'NOPE'" in errors[1]
@@ -0,0 +1,34 @@
+import pytest
+
+from core import trace
+from core.trace import Tracer, per_company_template
+
+
+@pytest.mark.parametrize("template, expected", [
+    ("trace.jsonl.gz", "trace.{company}.jsonl.gz"),
+    ("/tmp/run_{pid}.jsonl", "/tmp/run_{pid}.{company}.jsonl"),
+    ("traces/{company}.jsonl.gz", "traces/{company}.jsonl.gz"),
+    ("trace", "trace.{company}"),
+])
+def test_per_company_template(template, expected):
+    assert per_company_template(template) == expected
+
+
+def test_record_then_replay(tmp_path):
+    path = tmp_path / "trace.jsonl.gz"
+    recorder = Tracer(path, "record")
+    recorder.record_llm("plan", "cto", "prompt one", "response one")
+    recorder.record_tool("READ_FILE", {"path": "a.md"}, {"status": "success", "content": "A"})
+    recorder.close()
+
+    replayer = Tracer(path, "replay")
+    assert replayer.replay_llm("plan", "cto", "prompt one") == "response one"
+    assert replayer.replay_tool("READ_FILE", {"path": "a.md"}) == {"status": "success", "content": "A"}
+    assert replayer.replay_tool("DELEGATE_TASK", {}) is None
+
+
+def test_missing_replay_trace_disables_tracing(tmp_path, monkeypatch):
+    monkeypatch.setenv("TRACE_MODE", "replay")
+    monkeypatch.setenv("TRACE_FILE", str(tmp_path / "missing.{company}.jsonl"))
+    assert trace.tracer_from_env(company="acme") is None
+    assert trace.tracer_from_env() is None # Placeholder not available
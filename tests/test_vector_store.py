@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from core.vector_store import FlatVectorStore
+
+DIMS = 32
+
+
+def unit_vectors(count: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(count, DIMS)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def fill(store: FlatVectorStore, vectors: np.ndarray, prefix: str = "doc"):
+    ids = [f"{prefix}{i}" for i in range(len(vectors))]
+    store.add(ids=ids, embeddings=vectors.tolist(), documents=[f"text of {doc_id}" for doc_id in ids],
+              metadatas=[{"n": i} for i in range(len(ids))])
+    return ids
+
+
+@pytest.mark.parametrize("settings", [
+    {"dtype": "float32"},
+    {"dtype": "float16"},
+    {"dtype": "int8", "rerank_candidates": 10},
+    {"dtype": "int8", "dims": 16, "rerank_candidates": 10},
+])
+def test_round_trip_finds_each_vector(tmp_path, settings):
+    vectors = unit_vectors(40)
+    store = FlatVectorStore(tmp_path, **settings)
+    ids = fill(store, vectors)
+
+    reopened = FlatVectorStore(tmp_path, **settings)
+    assert reopened.count() == 40
+    for doc_id, vector in zip(ids, vectors):
+        result = reopened.query([vector.tolist()], n_results=1)
+        assert result["ids"] == [[doc_id]]
+        assert result["distances"][0][0] == pytest.approx(0, abs=0.05)
+    assert reopened.get(ids=["doc3"])["metadatas"] == [{"n": 3}]
+
+
+def test_sidecar_is_only_written_when_it_adds_precision(tmp_path):
+    vectors = unit_vectors(5)
+    fill(FlatVectorStore(tmp_path / "f32", dtype="float32", rerank_candidates=10), vectors)
+    fill(FlatVectorStore(tmp_path / "int8", dtype="int8", dims=16), vectors)
+    fill(FlatVectorStore(tmp_path / "rerank", dtype="int8", dims=16, rerank_candidates=10), vectors)
+
+    assert not (tmp_path / "f32" / "full.bin").exists()
+    assert (tmp_path / "f32" / "vectors.bin").stat().st_size == 5 * DIMS * 4
+    assert not (tmp_path / "int8" / "full.bin").exists()
+    assert (tmp_path / "int8" / "vectors.bin").stat().st_size == 5 * 16
+    assert (tmp_path / "rerank" / "full.bin").stat().st_size == 5 * DIMS * 2
+
+
+def test_update_and_delete_survive_reopen(tmp_path):
+    store = FlatVectorStore(tmp_path)
+    fill(store, unit_vectors(3))
+    store.update(ids=["doc0"], metadatas=[{"n": 99}])
+    store.delete(ids=["doc1"])
+
+    reopened = FlatVectorStore(tmp_path)
+    assert reopened.get()["ids"] == ["doc0", "doc2"]
+    assert reopened.get(ids=["doc0"])["metadatas"] == [{"n": 99}]
+
+
+@pytest.mark.parametrize("settings", [{"dtype": "float32"}, {"dtype": "int8", "rerank_candidates": 10}])
+def test_reopen_after_interrupted_add(tmp_path, settings):
+    store = FlatVectorStore(tmp_path, **settings)
+    fill(store, unit_vectors(2))
+    # An add that died after its vector rows were (partly) written, before its log record.
+    with open(tmp_path / "vectors.bin", "ab") as f:
+        f.write(b"\x01" * (store._row_files()["vectors.bin"] + 7))
+
+    reopened = FlatVectorStore(tmp_path, **settings)
+    assert reopened.count() == 2
+    new_vector = unit_vectors(1, seed=1)[0]
+    reopened.add(ids=["c"], embeddings=[new_vector.tolist()], documents=["c"], metadatas=[{}])
+
+    again = FlatVectorStore(tmp_path, **settings)
+    result = again.query([new_vector.tolist()], n_results=1)
+    assert result["ids"] == [["c"]]
+    assert result["distances"][0][0] == pytest.approx(0, abs=0.05)
+
+
+def test_torn_log_record_is_ignored(tmp_path):
+    store = FlatVectorStore(tmp_path)
+    fill(store, unit_vectors(2))
+    with open(tmp_path / "records.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"op":"delete","id":"doc0"')
+
+    assert FlatVectorStore(tmp_path).count() == 2
+
+
+def test_log_is_compacted(tmp_path):
+    store = FlatVectorStore(tmp_path)
+    fill(store, unit_vectors(2))
+    for i in range(1500):
+        store.update(ids=["doc0"], metadatas=[{"n": i}])
+
+    with open(tmp_path / "records.jsonl", encoding="utf-8") as f:
+        assert sum(1 for _ in f) < 1000
+    assert FlatVectorStore(tmp_path).get(ids=["doc0"])["metadatas"] == [{"n": 1499}]